@@ -4,6 +4,7 @@ The log tracks all print commands
 """
 
 import numpy as np
+from collections import deque
 from typing import Dict, List
 from datamodel import OrderDepth, TradingState, Order
 
@@ -15,6 +16,57 @@ def limtransform(pos, max_limit, buyers, sellers):
         return abs(0.75*max_limit - pos)
     else:
         return abs(np.floor((max_limit/30)*(1-(sellers*pos/max_limit*buyers))))
+class RollingExtrema:
+    """
+    max and min of the window most recent values and where they sit in the window, in amortised O(1).
+    each side is a monotonic deque of (index, value): a new value drops the values behind it that it beats,
+    so the front is always the extreme, the oldest one on ties as np.argmax/np.argmin
+    """
+    def __init__(self, window):
+        self.window = window
+        self.count = 0
+        self.highs = deque()
+        self.lows = deque()
+    def append(self, value):
+        index = self.count
+        self.count += 1
+        highs, lows = self.highs, self.lows
+        while highs and highs[-1][1] < value:
+            highs.pop()
+        highs.append((index, value))
+        while lows and lows[-1][1] > value:
+            lows.pop()
+        lows.append((index, value))
+        start = self.count - self.window
+        if highs[0][0] < start:
+            highs.popleft()
+        if lows[0][0] < start:
+            lows.popleft()
+    def __len__(self):
+        return min(self.count, self.window)
+    @property
+    def max(self):
+        return self.highs[0][1]
+    @property
+    def min(self):
+        return self.lows[0][1]
+    @property
+    def argmax(self):
+        """position of the max in the window, 0 the oldest value"""
+        return self.highs[0][0] - (self.count - len(self))
+    @property
+    def argmin(self):
+        """position of the min in the window, 0 the oldest value"""
+        return self.lows[0][0] - (self.count - len(self))
+    @property
+    def max_age(self):
+        """ticks since the max, 0 for the latest value"""
+        return self.count - 1 - self.highs[0][0]
+    @property
+    def min_age(self):
+        """ticks since the min, 0 for the latest value"""
+        return self.count - 1 - self.lows[0][0]
+
 # asset class: stores info about an asset not in the datamodel
 class Asset:
     """asset class to contain previous prices, and the limits for an asset"""
@@ -22,6 +74,7 @@ class Asset:
         self.limit = limit
         self.ask_prices = []
         self.bid_prices = []
+        self.ask_extrema = RollingExtrema(period)
         self.period = period
         self.fast_period = fast_period
     def update_ask_prices(self, ask_price):
@@ -31,6 +84,7 @@ class Asset:
         else:
             self.ask_prices.pop(0)
             self.ask_prices.append(ask_price)
+        self.ask_extrema.append(ask_price)
     def update_bid_prices(self, bid_price):
         """update the period most recent ask prices"""
         if len(self.bid_prices)<self.period:
@@ -39,10 +93,10 @@ class Asset:
             self.bid_prices.pop(0)
             self.bid_prices.append(bid_price)
 
-def aroon(prices:list, lb):
-    """returns the aroon oscillator values given a list of prices and the lookback period"""
-    up = 100*np.argmax(prices)/lb
-    down = 100*np.argmin(prices)/lb
+def aroon(extrema, lb):
+    """returns the aroon oscillator values given the rolling extrema of the prices and the lookback period"""
+    up = 100*extrema.argmax/lb
+    down = 100*extrema.argmin/lb
     return up, down
 
 class Trader:
@@ -134,8 +188,8 @@ class Trader:
 
                 if len(assets[product].ask_prices)>=assets[product].period:
 
-                    aroon_PC_up, aroon_PC_down = aroon(assets['PINA_COLADAS'].ask_prices, assets[product].period)
-                    aroon_C_up, aroon_C_down = aroon(assets['COCONUTS'].ask_prices, assets[product].period)
+                    aroon_PC_up, aroon_PC_down = aroon(assets['PINA_COLADAS'].ask_extrema, assets[product].period)
+                    aroon_C_up, aroon_C_down = aroon(assets['COCONUTS'].ask_extrema, assets[product].period)
 
                     #aroon up means buy
                     if (aroon_PC_up+aroon_C_up  > aroon_PC_down+aroon_C_down):
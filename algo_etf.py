@@ -15,37 +15,90 @@ def limtransform(pos, max_limit, buyers, sellers):
 
 def linear(pos, limit, base):
     return np.floor(base*(1-pos/limit))
+class History:
+    """
+    the capacity most recent values in a ring buffer, with a running mean and variance.
+    every value is written twice, capacity apart, so the window is always one contiguous slice
+    and values() and last(k) are views rather than copies
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = np.zeros(2*capacity)
+        self.end = capacity
+        self.count = 0
+        self.running_mean = 0.0
+        self.m2 = 0.0
+    def append(self, value):
+        """add a value, dropping the oldest once full, in O(1)"""
+        capacity = self.capacity
+        if self.end == 2*capacity:
+            self.end = capacity
+        oldest = self.buffer[self.end - capacity]
+        self.buffer[self.end - capacity] = value
+        self.buffer[self.end] = value
+        self.end += 1
+        if self.count < capacity:
+            # welford
+            self.count += 1
+            delta = value - self.running_mean
+            self.running_mean += delta/self.count
+            self.m2 += delta*(value - self.running_mean)
+        else:
+            # sliding welford: value replaces oldest
+            mean = self.running_mean + (value - oldest)/capacity
+            self.m2 += (value - oldest)*(value - mean + oldest - self.running_mean)
+            self.running_mean = mean
+            if self.end == 2*capacity:
+                # resync once per lap so rounding cannot build up
+                window = self.values()
+                self.running_mean = float(window.mean())
+                self.m2 = float(((window - self.running_mean)**2).sum())
+    def __len__(self):
+        return self.count
+    def values(self):
+        """the window oldest first, a view"""
+        return self.buffer[self.end - self.count:self.end]
+    def last(self, k):
+        """the k most recent values oldest first, a view"""
+        return self.buffer[self.end - min(k, self.count):self.end]
+    def __getitem__(self, key):
+        return self.values()[key]
+    @property
+    def mean(self):
+        return self.running_mean
+    @property
+    def std(self):
+        """population standard deviation, as np.std"""
+        return np.sqrt(max(self.m2, 0.0)/self.count) if self.count else np.nan
+    def zscore(self, value):
+        return (value - self.running_mean)/self.std
+
 # asset class: stores info about an asset not in the datamodel
 class Asset:
     """asset class to contain previous prices, and the limits for an asset"""
     def __init__(self, limit, period, fast_period):
         self.limit = limit
-        self.ask_prices = []
-        self.bid_prices = []
-        self.residual = []
         self.period = period
         self.fast_period = fast_period
+    @property
+    def period(self):
+        return self._period
+    @period.setter
+    def period(self, period):
+        """a new period starts the histories afresh"""
+        self._period = period
+        self.ask_prices = History(period)
+        self.bid_prices = History(period)
+        self.residual = History(period)
     def update_ask_prices(self, ask_price):
         """update the period most recent ask prices"""
-        if len(self.ask_prices)<self.period:
-            self.ask_prices.append(ask_price)
-        else:
-            self.ask_prices.pop(0)
-            self.ask_prices.append(ask_price)
+        self.ask_prices.append(ask_price)
     def update_bid_prices(self, bid_price):
-        """update the period most recent ask prices"""
-        if len(self.bid_prices)<self.period:
-            self.bid_prices.append(bid_price)
-        else:
-            self.bid_prices.pop(0)
-            self.bid_prices.append(bid_price)
+        """update the period most recent bid prices"""
+        self.bid_prices.append(bid_price)
     def update_residual(self, res):
-        """update the period most recent ask prices"""
-        if len(self.residual)<self.period:
-            self.residual.append(res)
-        else:
-            self.residual.pop(0)
-            self.residual.append(res)
+        """update the period most recent residuals"""
+        self.residual.append(res)
 
 
 class Trader:
@@ -130,8 +183,8 @@ class Trader:
         basket_data_ready = False
         period = 250 # adjust
         if len(assets['PICNIC_BASKET'].residual) >= period:
-            self.res_basket = np.mean(assets['PICNIC_BASKET'].residual)
-            self.zscore_basket = (residual-self.res_basket)/np.std(assets['PICNIC_BASKET'].residual)
+            self.res_basket = assets['PICNIC_BASKET'].residual.mean
+            self.zscore_basket = assets['PICNIC_BASKET'].residual.zscore(residual)
             print('ready to trade')
             basket_data_ready = True
 
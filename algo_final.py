@@ -3,7 +3,11 @@ The python module to be uploaded to the website, with the algorithmic trading lo
 The log tracks all print commands
 """
 
+import json
 import numpy as np
+from time import perf_counter
+from bisect import insort
+from collections import deque
 from typing import Dict, List
 from datamodel import OrderDepth, TradingState, Order
 
@@ -15,43 +19,1033 @@ def limtransform(pos, max_limit, buyers, sellers):
 
 def linear(pos, limit, base):
     return np.floor(base*(1-pos/limit))
+
+def ask_prices(order_depth):
+    """ask prices best first, read from the cache when the order depth keeps its sides sorted"""
+    prices = getattr(order_depth.sell_orders, "prices", None)
+    return prices if prices is not None else sorted(order_depth.sell_orders.keys())
+
+def bid_prices(order_depth):
+    """bid prices best first, read from the cache when the order depth keeps its sides sorted"""
+    prices = getattr(order_depth.buy_orders, "prices", None)
+    return prices if prices is not None else sorted(order_depth.buy_orders.keys(), reverse=True)
+
+def get_data(order_depth):
+    if len(order_depth.sell_orders) > 0:
+        asks = ask_prices(order_depth)
+        best_ask = asks[0]
+        best_ask_volume = order_depth.sell_orders[best_ask]
+    if len(order_depth.buy_orders) != 0:
+        bids = bid_prices(order_depth)
+        best_bid = bids[0]
+        best_bid_volume = order_depth.buy_orders[best_bid]
+        mid = (best_ask+best_bid)/2
+    return best_ask, best_ask_volume, best_bid, best_bid_volume, mid, asks, bids
+
+def book_leg(order_depth, bids, units, sign):
+    """a basket_size leg from one side of an order depth"""
+    if bids:
+        prices = bid_prices(order_depth)
+        return prices, [order_depth.buy_orders[p] for p in prices], units, sign
+    prices = ask_prices(order_depth)
+    return prices, [-order_depth.sell_orders[p] for p in prices], units, sign
+
+def basket_size(legs, edge, max_baskets):
+    """
+    profit maximising number of baskets to trade through the full visible depth.
+    legs are (prices best first, absolute volumes, units per basket, +1 for the side we sell into, -1 for the side we buy);
+    profit(n) = sum of +/- cost of the first units*n units of each leg on its cumulative cost curve - edge*n.
+    returns the size and per leg the worst price it has to reach, the price to send the order at
+    """
+    if max_baskets <= 0:
+        return 0, None
+    # profit is concave in n, so if the first basket loses none will gain: check it on the top levels first
+    first = -edge
+    for prices, volumes, units, sign in legs:
+        need = units
+        for price, volume in zip(prices, volumes):
+            take = min(volume, need)
+            first += sign*price*take
+            need -= take
+            if need == 0:
+                break
+        if need:
+            return 0, None
+    if first <= 0:
+        return 0, None
+    n_max = max_baskets
+    curves = []
+    for prices, volumes, units, sign in legs:
+        unit_prices = np.repeat(np.asarray(prices, dtype=float), np.asarray(volumes, dtype=int))
+        n_max = min(n_max, len(unit_prices)//units)
+        curves.append(unit_prices)
+    if n_max <= 0:
+        return 0, None
+    n = np.arange(n_max + 1)
+    profit = -edge*n
+    for (_, _, units, sign), unit_prices in zip(legs, curves):
+        cumulative = np.concatenate(([0.0], np.cumsum(unit_prices[:units*n_max])))
+        profit = profit + sign*cumulative[units*n]
+    size = int(np.argmax(profit))
+    if size == 0 or profit[size] <= 0:
+        return 0, None
+    return size, [int(unit_prices[units*size - 1]) for (_, _, units, _), unit_prices in zip(legs, curves)]
+
+class History:
+    """
+    the capacity most recent values in a ring buffer, with a running mean and variance.
+    every value is written twice, capacity apart, so the window is always one contiguous slice
+    and values() and last(k) are views rather than copies
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = np.zeros(2*capacity)
+        self.end = capacity
+        self.count = 0
+        self.running_mean = 0.0
+        self.m2 = 0.0
+    def append(self, value):
+        """add a value, dropping the oldest once full, in O(1)"""
+        capacity = self.capacity
+        if self.end == 2*capacity:
+            self.end = capacity
+        oldest = self.buffer[self.end - capacity]
+        self.buffer[self.end - capacity] = value
+        self.buffer[self.end] = value
+        self.end += 1
+        if self.count < capacity:
+            # welford
+            self.count += 1
+            delta = value - self.running_mean
+            self.running_mean += delta/self.count
+            self.m2 += delta*(value - self.running_mean)
+        else:
+            # sliding welford: value replaces oldest
+            mean = self.running_mean + (value - oldest)/capacity
+            self.m2 += (value - oldest)*(value - mean + oldest - self.running_mean)
+            self.running_mean = mean
+            if self.end == 2*capacity:
+                # resync once per lap so rounding cannot build up
+                window = self.values()
+                self.running_mean = float(window.mean())
+                self.m2 = float(((window - self.running_mean)**2).sum())
+    def __len__(self):
+        return self.count
+    def values(self):
+        """the window oldest first, a view"""
+        return self.buffer[self.end - self.count:self.end]
+    def last(self, k):
+        """the k most recent values oldest first, a view"""
+        return self.buffer[self.end - min(k, self.count):self.end]
+    def __getitem__(self, key):
+        return self.values()[key]
+    @property
+    def mean(self):
+        return self.running_mean
+    @property
+    def std(self):
+        """population standard deviation, as np.std"""
+        return np.sqrt(max(self.m2, 0.0)/self.count) if self.count else np.nan
+    def zscore(self, value):
+        return (value - self.running_mean)/self.std
+
+class RollingOLS:
+    """
+    y = alpha + beta x fitted over the window most recent (x, y), or exponentially weighted with halflife,
+    from running sums updated in O(1) per tick. sums are of x and y less their first values, which keeps
+    the squares small, and a rolling window is resummed once per lap so rounding cannot build up
+    """
+    def __init__(self, window=None, halflife=None):
+        if (window is None) == (halflife is None):
+            raise ValueError("give one of window or halflife")
+        self.window = window
+        self.decay = 0.5**(1/halflife) if halflife is not None else None
+        self.count = 0
+        self.x_shift = self.y_shift = None
+        # weight, sum x, sum y, sum xx, sum xy, sum yy
+        self.sums = [0.0]*6
+        if window is not None:
+            self.xs = np.zeros(window)
+            self.ys = np.zeros(window)
+    def update(self, x, y):
+        if self.x_shift is None:
+            self.x_shift, self.y_shift = x, y
+        dx = x - self.x_shift
+        dy = y - self.y_shift
+        w, sx, sy, sxx, sxy, syy = self.sums
+        if self.decay is not None:
+            d = self.decay
+            self.sums = [d*w + 1, d*sx + dx, d*sy + dy, d*sxx + dx*dx, d*sxy + dx*dy, d*syy + dy*dy]
+            self.count += 1
+            return
+        i = self.count % self.window
+        if self.count >= self.window:
+            ox, oy = self.xs[i], self.ys[i]
+            w, sx, sy, sxx, sxy, syy = w - 1, sx - ox, sy - oy, sxx - ox*ox, sxy - ox*oy, syy - oy*oy
+        self.xs[i] = dx
+        self.ys[i] = dy
+        self.count += 1
+        if i == self.window - 1:
+            xs, ys = self.xs, self.ys
+            self.sums = [float(self.window), float(xs.sum()), float(ys.sum()), float(xs.dot(xs)), float(xs.dot(ys)),
+                         float(ys.dot(ys))]
+        else:
+            self.sums = [w + 1, sx + dx, sy + dy, sxx + dx*dx, sxy + dx*dy, syy + dy*dy]
+    def __len__(self):
+        return self.count if self.window is None else min(self.count, self.window)
+    def moments(self):
+        """mean x, mean y (both shifted), var x, cov xy, var y"""
+        w, sx, sy, sxx, sxy, syy = self.sums
+        mx, my = sx/w, sy/w
+        return mx, my, sxx/w - mx*mx, sxy/w - mx*my, syy/w - my*my
+    @property
+    def beta(self):
+        _, _, var_x, cov, _ = self.moments()
+        return cov/var_x if var_x > 0 else np.nan
+    @property
+    def alpha(self):
+        mx, my, var_x, cov, _ = self.moments()
+        beta = cov/var_x if var_x > 0 else np.nan
+        return my + self.y_shift - beta*(mx + self.x_shift)
+    @property
+    def residual_std(self):
+        """std of the fitted residuals over the window"""
+        _, _, var_x, cov, var_y = self.moments()
+        beta = cov/var_x if var_x > 0 else np.nan
+        return np.sqrt(max(var_y - beta*cov, 0.0))
+    def fit(self, x, y):
+        """hedge ratio beta and the z-score of y - alpha - beta x against the residual std, in one pass"""
+        mx, my, var_x, cov, var_y = self.moments()
+        if not var_x > 0:
+            return np.nan, np.nan
+        beta = cov/var_x
+        residual = (y - self.y_shift - my) - beta*(x - self.x_shift - mx)
+        return beta, residual/np.sqrt(max(var_y - beta*cov, 0.0))
+
+class Spread:
+    """
+    a relative value trade declared once and traded by a SpreadBook.
+    legs are (product, weight) or (product, weight, spread_below): one spread is long weight of each product,
+    short where the weight is negative, the first leg is the anchor. a leg with spread_below only trades while
+    its quoted spread is below it. the signal is
+        "level"   the residual: what selling one spread at the touch takes in
+        "zscore"  z-score of the mid residual over the residual History of the Asset named by history
+        "ols"     z-score of a RollingOLS of the anchor mid on the second leg mid over that Asset's period,
+                  whose beta then replaces the second leg's weight
+    spreads are sold while the signal is above sell_above and bought while below buy_below. a held spread is
+    sold back while the signal is above exit_long, or bought back while below exit_short, if those are given.
+    orders are up to max_size spreads, or probe_size when the touch leaves no room but the anchor limit does;
+    full_depth sizes them through every visible level with basket_size instead, which needs integer weights
+    """
+    def __init__(self, name, legs, sell_above, buy_below, signal="level", history=None, exit_long=None,
+                 exit_short=None, max_size=None, probe_size=0, full_depth=False):
+        if signal not in ("level", "zscore", "ols"):
+            raise ValueError(f"unknown spread signal {signal}")
+        if signal != "level" and history is None:
+            raise ValueError(f"a {signal} spread needs the Asset whose period it uses as history")
+        self.name = name
+        self.legs = legs
+        self.sell_above = sell_above
+        self.buy_below = buy_below
+        self.signal = signal
+        self.history = history
+        self.exit_long = exit_long
+        self.exit_short = exit_short
+        self.max_size = max_size
+        self.probe_size = probe_size
+        self.full_depth = full_depth
+        self.model = None
+        self.check()
+    def check(self):
+        """full_depth sizes whole spreads in seashells of edge, so it takes a level signal and integer weights"""
+        if self.full_depth and (self.signal != "level" or any(leg[1] != int(leg[1]) for leg in self.legs)):
+            raise ValueError(f"full_depth spread {self.name} needs signal='level' and integer leg weights")
+
+class SpreadBook:
+    """
+    the spreads a trader runs, evaluated together each tick: the touch of every leg product is read once,
+    then the residuals, signals and gates of all spreads are computed as arrays over (spread, product)
+    and only the spreads past a threshold are sized and send their leg orders, so a new spread adds a row
+    rather than code. the definitions are read at the first evaluate, compile() again after changing one.
+    spreads sharing a product each see the whole of its position limit
+    """
+    def __init__(self, spreads):
+        self.spreads = list(spreads)
+        self.by_name = {spread.name: spread for spread in self.spreads}
+        self.products = list(dict.fromkeys(leg[0] for spread in self.spreads for leg in spread.legs))
+        self.compiled = False
+    def __getitem__(self, name):
+        return self.by_name[name]
+    def __iter__(self):
+        return iter(self.spreads)
+    def compile(self):
+        index = {product: i for i, product in enumerate(self.products)}
+        shape = (len(self.spreads), len(self.products))
+        self.weights = np.zeros(shape)
+        self.spread_below = np.full(shape, np.inf)
+        thresholds = []
+        for s, spread in enumerate(self.spreads):
+            # again here, as full_depth may have been set after construction, e.g. by sweep.configure
+            spread.check()
+            for leg in spread.legs:
+                self.weights[s, index[leg[0]]] = leg[1]
+                if len(leg) > 2:
+                    self.spread_below[s, index[leg[0]]] = leg[2]
+            thresholds.append([spread.sell_above, spread.buy_below,
+                               np.nan if spread.exit_long is None else spread.exit_long,
+                               np.nan if spread.exit_short is None else spread.exit_short])
+        self.sell_above, self.buy_below, self.exit_long, self.exit_short = np.array(thresholds, dtype=float).T
+        self.legs = self.weights != 0
+        self.leg_index = [[index[leg[0]] for leg in spread.legs] for spread in self.spreads]
+        self.spread_index = np.arange(len(self.spreads))
+        self.anchor = np.array([legs[0] for legs in self.leg_index])
+        self.full_depth = np.array([spread.full_depth for spread in self.spreads])
+        self.any_full_depth = bool(self.full_depth.any())
+        self.histories = [s for s, spread in enumerate(self.spreads) if spread.signal != "level"]
+        self.exits = any(spread.exit_long is not None or spread.exit_short is not None for spread in self.spreads)
+        # residuals as one product with the [bids, asks] of all products: selling at the touch for "level",
+        # the mid residual for the others
+        level = np.array([spread.signal == "level" for spread in self.spreads])[:, None]
+        self.residual_weights = np.hstack([np.where(level, np.maximum(self.weights, 0), self.weights/2),
+                                           np.where(level, np.minimum(self.weights, 0), self.weights/2)])
+        self.compiled = True
+    def evaluate(self, state, assets, result, log):
+        """add the orders of every spread to result, which gets a list for each leg of a spread with a signal"""
+        if not self.compiled:
+            self.compile()
+        spreads = self.spreads
+        products = self.products
+        # bids, asks, bid volumes, ask volumes, positions and limits of all products, read into one array
+        bids, asks, bid_volumes, ask_volumes = [], [], [], []
+        missing = False
+        for product in products:
+            order_depth = state.order_depths.get(product)
+            if order_depth is not None and order_depth.buy_orders:
+                bid = bid_prices(order_depth)[0]
+                bids.append(bid)
+                bid_volumes.append(order_depth.buy_orders[bid])
+            else:
+                bids.append(np.nan)
+                bid_volumes.append(np.nan)
+                missing = True
+            if order_depth is not None and order_depth.sell_orders:
+                ask = ask_prices(order_depth)[0]
+                asks.append(ask)
+                ask_volumes.append(order_depth.sell_orders[ask])
+            else:
+                asks.append(np.nan)
+                ask_volumes.append(np.nan)
+                missing = True
+        book = np.array(bids + asks + bid_volumes + ask_volumes + [state.position.get(p, 0) for p in products]
+                        + [assets[p].limit for p in products], dtype=float).reshape(6, len(products))
+        touch = book[:2].reshape(-1)
+        residual = self.residual_weights @ touch
+        blocked = None
+        if missing:
+            # a missing book side would spread NaN through the products a spread has no leg in
+            missing = np.isnan(touch)
+            blocked = (np.hstack([self.legs, self.legs]) & missing).any(axis=1)
+            residual = self.residual_weights @ np.where(missing, 0, touch)
+        signal = residual if blocked is None else np.where(blocked, np.nan, residual)
+        weights = self.weights
+        for s in self.histories:
+            spread = spreads[s]
+            value = signal[s]
+            signal[s] = np.nan
+            if value != value:
+                continue
+            asset = assets[spread.history]
+            anchor, second = self.leg_index[s][:2]
+            if spread.signal == "zscore":
+                asset.update_residual(value)
+                if len(asset.residual) >= asset.period:
+                    signal[s] = asset.residual.zscore(value)
+                continue
+            x = (book[0, second] + book[1, second])/2
+            y = (book[0, anchor] + book[1, anchor])/2
+            if spread.model is None or spread.model.window != asset.period:
+                spread.model = RollingOLS(window=asset.period)
+            spread.model.update(x, y)
+            if len(spread.model) >= asset.period:
+                beta, zscore = spread.model.fit(x, y)
+                # a degenerate window gives no usable ratio
+                if beta > 0 and np.isfinite(zscore):
+                    if weights is self.weights:
+                        weights = weights.copy()
+                    weights[s, second] = -beta
+                    signal[s] = zscore
+
+        for s, value in enumerate(signal.tolist()):
+            spread = spreads[s]
+            if value == value or spread.full_depth and (blocked is None or not blocked[s]):
+                for leg in spread.legs:
+                    result.setdefault(leg[0], [])
+        gate = ~((book[1] - book[0]) >= self.spread_below).any(axis=1)
+        if self.any_full_depth:
+            for s in np.flatnonzero(self.full_depth & gate):
+                if blocked is None or not blocked[s]:
+                    self.depth_orders(state, assets, spreads[s], result, log)
+
+        sell = signal > self.sell_above
+        active = sell | (signal < self.buy_below)
+        if self.exits:
+            held = book[4, self.anchor]/weights[self.spread_index, self.anchor]
+            sell = sell | (~active & (held > 0) & (signal > self.exit_long))
+            active = active | sell | ((held < 0) & (signal < self.exit_short))
+        active &= gate
+        if self.any_full_depth:
+            active &= ~self.full_depth
+        # most ticks no spread is past a threshold with its legs quoted tightly enough
+        if active.any():
+            self.orders(book, weights, signal, np.flatnonzero(active), sell, result, log)
+    def orders(self, book, weights, signal, active, sell, result, log):
+        """size the spreads evaluate found past a threshold and send their leg orders at the touch"""
+        bids, asks, bid_volumes, ask_volumes, positions, limits = book.tolist()
+        for s in active.tolist():
+            spread = self.spreads[s]
+            selling = bool(sell[s])
+            direction = -1 if selling else 1
+            # spreads the touch and limits allow on the tightest leg: a leg sold takes the bid, a leg bought the ask
+            size = np.inf
+            for i in self.leg_index[s]:
+                weight = weights[s, i]
+                if direction*weight > 0:
+                    size = min(size, min(-ask_volumes[i], limits[i] - positions[i])/abs(weight))
+                else:
+                    size = min(size, min(bid_volumes[i], limits[i] + positions[i])/abs(weight))
+            size = np.floor(size)
+            anchor = self.leg_index[s][0]
+            anchor_weight = weights[s, anchor]
+            if not (signal[s] > spread.sell_above if selling else signal[s] < spread.buy_below):
+                # an exit only unwinds what is held
+                size = min(size, np.floor(abs(positions[anchor]/anchor_weight)))
+            elif spread.probe_size and size == 0:
+                size = min(spread.probe_size, (limits[anchor] - abs(positions[anchor]))/abs(anchor_weight))
+            if spread.max_size is not None:
+                size = min(size, spread.max_size)
+            if not size > 0:
+                continue
+            for leg, i in zip(spread.legs, self.leg_index[s]):
+                quantity = int(np.round(direction*weights[s, i]*size))
+                price = int(asks[i] if quantity > 0 else bids[i])
+                log.trade(LOG_ORDER, leg[0], price, quantity)
+                result[leg[0]].append(Order(leg[0], price, quantity))
+    def depth_orders(self, state, assets, spread, result, log):
+        """
+        a full_depth spread: sell as many spreads as pay more than sell_above through the visible levels,
+        or else buy as many as cost less than buy_below, within the position limits of every leg
+        """
+        products = [leg[0] for leg in spread.legs]
+        units = [int(abs(leg[1])) for leg in spread.legs]
+        signs = [1 if leg[1] > 0 else -1 for leg in spread.legs]
+        depths = [state.order_depths[p] for p in products]
+        positions = [state.position.get(p, 0) for p in products]
+        for direction, edge in ((-1, spread.sell_above), (1, -spread.buy_below)):
+            # direction*sign is +1 on the legs bought, which take asks
+            room = min((assets[p].limit - direction*sign*position)//u
+                       for p, u, sign, position in zip(products, units, signs, positions))
+            size, prices = basket_size([book_leg(d, direction*sign < 0, u, -direction*sign)
+                                        for d, u, sign in zip(depths, units, signs)], edge, room)
+            if size > 0:
+                break
+        if size == 0:
+            return
+        for product, u, sign, price in zip(products, units, signs, prices):
+            quantity = direction*sign*u*size
+            log.trade(LOG_ORDER, product, price, quantity)
+            result[product].append(Order(product, price, quantity))
+
 # asset class: stores info about an asset not in the datamodel
 class Asset:
     """asset class to contain previous prices, and the limits for an asset"""
     def __init__(self, limit, period, fast_period):
         self.limit = limit
-        self.ask_prices = []
-        self.bid_prices = []
-        self.residual = []
         self.period = period
         self.fast_period = fast_period
+    @property
+    def period(self):
+        return self._period
+    @period.setter
+    def period(self, period):
+        """a new period starts the histories afresh"""
+        self._period = period
+        self.ask_prices = History(period)
+        self.bid_prices = History(period)
+        self.residual = History(period)
     def update_ask_prices(self, ask_price):
         """update the period most recent ask prices"""
-        if len(self.ask_prices)<self.period:
-            self.ask_prices.append(ask_price)
-        else:
-            self.ask_prices.pop(0)
-            self.ask_prices.append(ask_price)
+        self.ask_prices.append(ask_price)
     def update_bid_prices(self, bid_price):
-        """update the period most recent ask prices"""
-        if len(self.bid_prices)<self.period:
-            self.bid_prices.append(bid_price)
-        else:
-            self.bid_prices.pop(0)
-            self.bid_prices.append(bid_price)
+        """update the period most recent bid prices"""
+        self.bid_prices.append(bid_price)
     def update_residual(self, res):
-        """update the period most recent ask prices"""
-        if len(self.residual)<self.period:
-            self.residual.append(res)
+        """update the period most recent residuals"""
+        self.residual.append(res)
+
+# log levels: a Logger records the calls at or below its level, the others are bound to a no-op
+LOG_OFF, LOG_TRADES, LOG_INFO, LOG_DEBUG = 0, 1, 2, 3
+# event codes and the numeric fields of each, written once in the log header for the decoder
+LOG_ORDER, LOG_MISSED, LOG_QUOTE, LOG_BOOK, LOG_SPIKE, LOG_VALUE = range(6)
+LOG_EVENTS = {
+    LOG_ORDER: ("order", ("price", "quantity")),
+    LOG_MISSED: ("missed", ("price", "volume", "position")),
+    LOG_QUOTE: ("quote", ("spread", "bid", "bid_size", "ask", "ask_size", "position")),
+    LOG_BOOK: ("book", ("bid_volume", "ask_volume")),
+    LOG_SPIKE: ("spike", ("delta", "direction")),
+    LOG_VALUE: ("value", ("value",)),
+}
+
+def _skip(*args):
+    pass
+
+class Logger:
+    """
+    compact structured log in place of print: trade, info and debug(event, product, *fields) append the
+    product index, the event code and the fields to a preallocated buffer, and flush(timestamp) prints
+    them once per run as a single line
+        ~timestamp product,event,field,...,product,event,field,...
+    the first flush prints a ~H header line with the products and LOG_EVENTS, from which tradelog decodes
+    the records. calls above the level are bound to a no-op, so they cost a call and their arguments
+    """
+    def __init__(self, products, level=LOG_INFO, capacity=1024):
+        self.products = list(products)
+        self.codes = {product: i for i, product in enumerate(self.products)}
+        self.level = level
+        self.buffer = [0]*capacity
+        self.size = 0
+        self.header = False
+        self.trade = self.record if level >= LOG_TRADES else _skip
+        self.info = self.record if level >= LOG_INFO else _skip
+        self.debug = self.record if level >= LOG_DEBUG else _skip
+    def record(self, event, product, *fields):
+        start = self.size
+        end = start + 2 + len(fields)
+        buffer = self.buffer
+        if end > len(buffer):
+            buffer.extend([0]*len(buffer))
+        buffer[start] = self.codes.get(product, -1)
+        buffer[start + 1] = event
+        buffer[start + 2:end] = fields
+        self.size = end
+    def flush(self, timestamp):
+        if not self.size:
+            return
+        if not self.header:
+            print("~H " + json.dumps({"products": self.products,
+                                      "events": {code: [name, fields] for code, (name, fields) in LOG_EVENTS.items()}},
+                                     separators=(",", ":")))
+            self.header = True
+        print(f"~{timestamp} " + ",".join(map(str, self.buffer[:self.size])))
+        self.size = 0
+
+class CounterpartyTracker:
+    """
+    rolling statistics of every named counterparty in every product from the market_trades of each run, O(1) a trade.
+    names are interned to codes, and each (code, product) keeps [net, count, time, hits, judged]:
+        net, count  position and number of trades decayed by half every half_life timestamps, decayed lazily on read
+        hits/judged the share of its trades whose price the mid moved through horizon timestamps later,
+                    judged from a queue per product as the mid becomes known
+    net, trades, hit_rate and signal read them without going back over any trade
+    """
+    def __init__(self, half_life=10000, horizon=1000):
+        self.half_life = half_life
+        self.horizon = horizon
+        self.codes = {}
+        self.names = []
+        self.stats = {}
+        # product -> codes that traded it, for signal
+        self.traders = {}
+        # product -> deque of (timestamp, code, side, price) waiting to be judged
+        self.pending = {}
+        self.timestamp = 0
+    def code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+    def add(self, code, product, side, quantity, price, timestamp):
+        stats = self.stats.get((code, product))
+        if stats is None:
+            stats = self.stats[(code, product)] = [0.0, 0.0, timestamp, 0, 0]
+            self.traders.setdefault(product, []).append(code)
+        decay = 0.5 ** ((timestamp - stats[2]) / self.half_life)
+        stats[0] = stats[0]*decay + side*quantity
+        stats[1] = stats[1]*decay + 1
+        stats[2] = timestamp
+        self.pending.setdefault(product, deque()).append((timestamp, code, side, price))
+    def update(self, state):
+        """judge the trades horizon old against the mids of state, then add the market trades of state"""
+        self.timestamp = timestamp = state.timestamp
+        stats = self.stats
+        for product, queue in self.pending.items():
+            if not queue or queue[0][0] + self.horizon > timestamp:
+                continue
+            order_depth = state.order_depths.get(product)
+            if order_depth is None or not order_depth.buy_orders or not order_depth.sell_orders:
+                continue
+            mid = (max(dict.keys(order_depth.buy_orders)) + min(dict.keys(order_depth.sell_orders)))/2
+            while queue and queue[0][0] + self.horizon <= timestamp:
+                _, code, side, price = queue.popleft()
+                judged = stats[(code, product)]
+                judged[3] += side*(mid - price) > 0
+                judged[4] += 1
+        for product, trades in state.market_trades.items():
+            for trade in trades:
+                buyer, seller = trade.buyer, trade.seller
+                # a bot trading with itself shows no direction
+                if buyer == seller:
+                    continue
+                if buyer:
+                    self.add(self.code(buyer), product, 1, trade.quantity, trade.price, trade.timestamp)
+                if seller:
+                    self.add(self.code(seller), product, -1, trade.quantity, trade.price, trade.timestamp)
+    def _get(self, name, product):
+        code = self.codes.get(name)
+        return None if code is None else self.stats.get((code, product))
+    def net(self, name, product):
+        """decayed net position of name in product, + long"""
+        stats = self._get(name, product)
+        return 0.0 if stats is None else stats[0]*0.5 ** ((self.timestamp - stats[2]) / self.half_life)
+    def trades(self, name, product):
+        """decayed number of recent trades of name in product"""
+        stats = self._get(name, product)
+        return 0.0 if stats is None else stats[1]*0.5 ** ((self.timestamp - stats[2]) / self.half_life)
+    def hit_rate(self, name, product):
+        """share of the judged trades of name in product the mid moved through, nan before any"""
+        stats = self._get(name, product)
+        return stats[3] / stats[4] if stats is not None and stats[4] else float("nan")
+    def signal(self, product, min_judged=20, min_hit_rate=0.5):
+        """
+        sum of the decayed net positions in product of the counterparties with at least min_judged trades judged,
+        weighted by how far their hit rate is above min_hit_rate: positive when the informed are buying
+        """
+        signal = 0.0
+        timestamp, half_life = self.timestamp, self.half_life
+        for code in self.traders.get(product, ()):
+            net, _, time, hits, judged = self.stats[(code, product)]
+            if judged >= min_judged and hits > min_hit_rate*judged:
+                signal += net*0.5 ** ((timestamp - time) / half_life)*(hits/judged - min_hit_rate)
+        return signal
+
+class Strategy:
+    """
+    a strategy Trader.run dispatches to, with its own state: run(state, assets, result) adds its orders to result.
+    products are the products whose order depths it reads, it is called on the ticks that quote one of them.
+    strategies run by priority, and once the tick's time budget is spent one above priority 0
+    only gets degrade, which by default sends nothing
+    """
+    name = None
+    products = ()
+    priority = 0
+    # the Logger and CounterpartyTracker of the registry, set on register
+    log = None
+    counterparties = None
+    def run(self, state, assets, result):
+        raise NotImplementedError
+    def degrade(self, state, assets, result):
+        pass
+
+class StrategyRegistry:
+    """
+    the strategies of a trader with a dispatch table from each product to the strategies reading it.
+    run calls the strategies due on a tick by priority, then registration order, and records the time each took.
+    budget is the seconds of a run after which strategies above priority 0 are degraded; a run over budget
+    is kept in overruns as (timestamp, seconds, names of the strategies degraded), the last max_overruns of them.
+    every strategy logs to log, which is off unless given, and can query counterparties, updated from the
+    market trades at the start of each run
+    """
+    def __init__(self, strategies=(), budget=None, max_overruns=100, log=None, counterparties=None):
+        self.log = log if log is not None else Logger((), LOG_OFF)
+        self.counterparties = counterparties if counterparties is not None else CounterpartyTracker()
+        self.strategies = []
+        self.by_name = {}
+        self.table = {}
+        self.budget = budget
+        self.overruns = deque(maxlen=max_overruns)
+        self.overrun_count = 0
+        for strategy in strategies:
+            self.register(strategy)
+    def register(self, strategy):
+        if strategy.name in self.by_name:
+            raise ValueError(f"a strategy named {strategy.name} is registered already")
+        # stable, so equal priorities keep their registration order
+        self.strategies = sorted(self.strategies + [strategy], key=lambda s: s.priority)
+        self.by_name[strategy.name] = strategy
+        strategy.log = self.log
+        strategy.counterparties = self.counterparties
+        self.table = {}
+        for i, registered in enumerate(self.strategies):
+            for product in registered.products:
+                self.table.setdefault(product, []).append(i)
+        return strategy
+    def __getitem__(self, name):
+        return self.by_name[name]
+    def __iter__(self):
+        return iter(self.strategies)
+    def due(self, order_depths):
+        """the strategies reading a product quoted in order_depths, in the order they run"""
+        table = self.table
+        due = set()
+        for product in order_depths:
+            due.update(table.get(product, ()))
+        return [self.strategies[i] for i in sorted(due)]
+    def run(self, state, assets, result, block_times):
+        budget = self.budget
+        degraded = []
+        tick_start = perf_counter()
+        self.counterparties.update(state)
+        for strategy in self.due(state.order_depths):
+            block_start = perf_counter()
+            if budget is not None and strategy.priority > 0 and block_start - tick_start >= budget:
+                strategy.degrade(state, assets, result)
+                degraded.append(strategy.name)
+            else:
+                strategy.run(state, assets, result)
+            block_times[strategy.name] = perf_counter() - block_start
+        elapsed = perf_counter() - tick_start
+        if budget is not None and (degraded or elapsed > budget):
+            self.overrun_count += 1
+            self.overruns.append((state.timestamp, elapsed, degraded))
+
+class PearlsStrategy(Strategy):
+    """STRAT 1 PEARLS: MM and spike misspricing"""
+    name = "pearls"
+    products = ("PEARLS",)
+    def run(self, state, assets, result):
+        product = "PEARLS"
+        # Retrieve the Order Depth containing all the market BUY and SELL orders for PEARLS
+        order_depth: OrderDepth = state.order_depths[product]
+        try:
+            position = state.position[product]
+        except KeyError:
+            position = 0
+        # Initialize the list of Orders to be sent as an empty list
+        orders: list[Order] = []
+
+        # Define a fair value for the PEARLS.
+        acceptable_price = 10000
+
+        # to see if there are available trades in the market
+        available_to_buy = False
+        available_to_sell = False
+
+        # If statement checks if there are any SELL orders in the PEARLS market
+        if len(order_depth.sell_orders) > 0:
+            available_to_buy = True # other people are selling ergo we can buy
+            # buy everything below our acceptable price
+            asks = ask_prices(order_depth)
+            min_profit = 0
+            for ask in asks:
+                if ask < acceptable_price-min_profit:
+                    vol = order_depth.sell_orders[ask]
+                    order_size = min(-vol, assets[product].limit-position)
+                    if order_size > 0:
+                        position = position + order_size
+                        self.log.trade(LOG_ORDER, product, ask, order_size)
+                        orders.append(Order(product, ask, order_size))
+                    else:
+                        self.log.info(LOG_MISSED, product, ask, vol, position)
+            assets[product].update_ask_prices(asks[0])
+
+        if len(order_depth.buy_orders) != 0:
+            available_to_sell = True # other people are buying ergo we can sell
+            # sell everything above our acceptable price
+            bids = bid_prices(order_depth)
+            for bid in bids:
+                if bid > acceptable_price:
+                    vol = order_depth.buy_orders[bid]
+                    order_size = min(vol, assets[product].limit+position)
+                    if order_size > 0:
+                        position = position - order_size
+                        self.log.trade(LOG_ORDER, product, bid, -order_size)
+                        orders.append(Order(product, bid, -order_size))
+                    else:
+                        self.log.info(LOG_MISSED, product, bid, vol, position)
+            assets[product].update_bid_prices(bids[0])
+
+        #MarketMaking
+        # Retrieve the Order Depth containing all the market BUY and SELL orders for PEARLS
+        ##########################################################
+        order_depth: OrderDepth = state.order_depths[product]
+        threshold = 6
+        spread = ask_prices(order_depth)[0]-bid_prices(order_depth)[0]
+        if spread >= threshold:
+            #adjust volumes later
+            #bid
+            bid_size = np.floor(10*(1-position/20))
+            if position != assets[product].limit and bid_size == 0:
+                if spread >= threshold+2:
+                    bid_size = 1
+            bid = bid_prices(order_depth)[0]+1
+            orders.append(Order(product, bid, bid_size))
+            #ask
+            ask_size = -np.floor(10*(1+position/20))
+            if position != assets[product].limit and ask_size == 0:
+                if spread >= threshold+2:
+                    ask_size = 1
+            ask = ask_prices(order_depth)[0]-1
+            orders.append(Order(product, ask, ask_size))
+            self.log.info(LOG_QUOTE, product, spread, bid, bid_size, ask, -ask_size, position)
+        ##########################################################
+
+        # Add all the above orders to the result dict
+        result[product] = orders
+
+class BananasStrategy(Strategy):
+    """STRAT 2 BANANAS: MM and spike misspricing"""
+    name = "bananas"
+    products = ("BANANAS",)
+    def run(self, state, assets, result):
+        product = "BANANAS"
+        # Retrieve the Order Depth containing all the market BUY and SELL orders for PEARLS
+        order_depth: OrderDepth = state.order_depths[product]
+
+        try:
+            position = state.position[product]
+        except KeyError:
+            position = 0
+        # Initialize the list of Orders to be sent as an empty list
+        orders: list[Order] = []
+
+        # If statement checks if there are any SELL orders in the BANANAS market
+        if len(order_depth.sell_orders) > 0:
+            best_ask = ask_prices(order_depth)[0]
+            best_ask_volume = order_depth.sell_orders[best_ask]
+            assets[product].update_ask_prices(best_ask)
+
+        if len(order_depth.buy_orders) != 0:
+            best_bid = bid_prices(order_depth)[0]
+            best_bid_volume = order_depth.buy_orders[best_bid]
+            assets[product].update_bid_prices(best_bid)
+
+        spread = best_ask-best_bid
+        threshold = 5
+        if spread < threshold:
+            if len(assets[product].ask_prices)>=assets[product].period:
+                fast_avg = (assets[product].ask_prices.last(assets[product].fast_period).sum()+assets[product].bid_prices.last(assets[product].fast_period).sum())/(2*assets[product].fast_period)
+                #check for buy signal
+                if fast_avg > best_ask:
+                    #available_to_buy = True
+                    order_size = min(-best_ask_volume, assets[product].limit-position)
+                    if order_size > 0:
+                        self.log.trade(LOG_ORDER, product, best_ask, order_size)
+                        orders.append(Order(product, best_ask, order_size))
+                #check for sell signal
+                elif fast_avg < best_bid:
+                    #available_to_sell = True
+                    order_size = min(best_bid_volume, assets[product].limit+position)
+                    if order_size > 0:
+                        self.log.trade(LOG_ORDER, product, best_bid, -order_size)
+                        orders.append(Order(product, best_bid, -order_size))
+
+        ##########################################################
+        if spread >= threshold:
+            #adjust volumes later
+            #bid
+            order_size = np.floor(5*(1-position/20)) #limtransform(position, 20, abs(best_bid_volume), abs(best_ask_volume)) #
+            self.log.debug(LOG_BOOK, product, best_bid_volume, best_ask_volume)
+            bid = bid_prices(order_depth)[0]+1
+            orders.append(Order(product, bid, order_size))
+            bid_size = order_size
+            #ask
+            order_size = -np.floor(5*(1+position/20)) #-limtransform(-position, 20, abs(best_ask_volume), abs(best_bid_volume))  #
+            ask = ask_prices(order_depth)[0]-1
+            orders.append(Order(product, ask, order_size))
+            self.log.info(LOG_QUOTE, product, spread, bid, bid_size, ask, -order_size, position)
+        ##########################################################
+
+        # Add all the above orders to the result dict
+        result[product] = orders
+
+class BerriesStrategy(Strategy):
+    """STRAT 4 BERRIES: LONG from MM BUYS then max SHORT from midday peak"""
+    name = "berries"
+    products = ("BERRIES",)
+    priority = 2
+    def __init__(self):
+        # up to 4 distinct highs sold into, kept sorted so the lowest is highs[0]
+        self.highs = []
+        self.active = False
+        self.start = 480000    # with leway from min original 480000
+        self.duration = 40000  # original 40000
+    def add_high(self, price):
+        """keep the 4 highest distinct highs, the lowest first"""
+        if price not in self.highs:
+            insort(self.highs, price)
+            if len(self.highs) >= 5:
+                self.highs.pop(0)
+    def degrade(self, state, assets, result):
+        """over budget: no quotes or orders, but the price histories keep up for the fast average"""
+        order_depth = state.order_depths["BERRIES"]
+        if order_depth.sell_orders:
+            assets["BERRIES"].update_ask_prices(ask_prices(order_depth)[0])
+        if order_depth.buy_orders:
+            assets["BERRIES"].update_bid_prices(bid_prices(order_depth)[0])
+    def run(self, state, assets, result):
+        product = "BERRIES"
+        # Retrieve the Order Depth containing all the market BUY and SELL orders for BERRIES
+        order_depth: OrderDepth = state.order_depths[product]
+
+        try:
+            position = state.position[product]
+        except KeyError:
+            position = 0
+        # Initialize the list of Orders to be sent as an empty list
+        orders: list[Order] = []
+
+        # If statement checks if there are any SELL orders in the BERRIES market
+        if len(order_depth.sell_orders) > 0:
+            best_ask = ask_prices(order_depth)[0]
+            best_ask_volume = order_depth.sell_orders[best_ask]
+            assets[product].update_ask_prices(best_ask)
+
+        if len(order_depth.buy_orders) != 0:
+            best_bid = bid_prices(order_depth)[0]
+            best_bid_volume = order_depth.buy_orders[best_bid]
+            assets[product].update_bid_prices(best_bid)
+
+        spread = best_ask-best_bid
+        threshold = 5
+        start = self.start
+        duration = self.duration
+        if (start < state.timestamp < start+duration): #if spread < threshold:
+            if len(assets[product].ask_prices)>=assets[product].period:
+                fast_avg = (assets[product].ask_prices.last(assets[product].fast_period).sum()+assets[product].bid_prices.last(assets[product].fast_period).sum())/(2*assets[product].fast_period)
+                #check for sell signal at midday highest price
+                if (fast_avg - 1) < best_bid:
+
+                    self.active = True
+                    order_size = min(best_bid_volume, assets[product].limit+position)
+                    if order_size > 0:
+                        self.log.trade(LOG_ORDER, product, best_bid, -order_size)
+                        orders.append(Order(product, best_bid, -order_size))
+                    if len(self.highs) == 0:
+                        self.add_high(best_bid)
+                    if (best_bid > self.highs[0]):
+                        self.add_high(best_bid)
+
+                #sell signal based off new high #elif, dont want if already above loop run
+                elif self.active:
+                    if (best_bid > self.highs[0]):
+                        order_size = min(best_bid_volume, assets[product].limit+position)
+                        if order_size > 0:
+                            self.log.trade(LOG_ORDER, product, best_bid, -order_size)
+                            orders.append(Order(product, best_bid, -order_size))
+                        self.add_high(best_bid)
+
+                #check for buy signal
+                elif fast_avg > best_ask and state.timestamp < 400000:
+                    #available_to_buy = True
+                    order_size = min(-best_ask_volume, assets[product].limit-position)
+                    if order_size > 0:
+                        self.log.trade(LOG_ORDER, product, best_ask, order_size)
+                        orders.append(Order(product, best_ask, order_size))
+
+        ##########################################################
+        if spread >= threshold and state.timestamp < 400000:
+            #adjust volumes later
+            #bid                 #50
+            order_size = np.floor(10*(1-position/250)) #change size 5
+            if position != 250 and order_size == 0:
+                order_size = np.floor((250-position)/2)
+                if position != 250 and order_size == 0:
+                    order_size = 1
+            bid = bid_prices(order_depth)[0]+1
+            orders.append(Order(product, bid, order_size))
+            bid_size = order_size
+            #ask
+            order_size = -np.floor(10*(1+position/250)) #change size 5
+            ask = ask_prices(order_depth)[0]-1
+            orders.append(Order(product, ask, order_size))
+            self.log.info(LOG_QUOTE, product, spread, bid, bid_size, ask, -order_size, position)
+        ##########################################################
+
+        # Add all the above orders to the result dict
+        result[product] = orders
+
+class DivingGearStrategy(Strategy):
+    """STRAT 5 DOLPHIN_SIGHTINGS peak DIVING_GEAR"""
+    name = "diving_gear"
+    products = ("DIVING_GEAR",)
+    priority = 1
+    def __init__(self):
+        self.position = {}
+        self.last_obs = None
+        self.buy_gear = False
+        self.sell_gear = False
+    def degrade(self, state, assets, result):
+        """over budget: no orders, but the last sighting keeps up so the next delta spans one tick"""
+        self.last_obs = state.observations['DOLPHIN_SIGHTINGS']
+    def run(self, state, assets, result):
+        product = "DIVING_GEAR"
+        order_depth_gear = state.order_depths["DIVING_GEAR"]
+        best_ask_gear, best_ask_volume_gear, best_bid_gear, best_bid_volume_gear, _, all_asks, all_bids = get_data(order_depth_gear)
+        # Initialize the method output dict as an empty dict
+        orders_gear: list[Order] = []
+
+        self.position[product] = state.position.get(product, 0)
+        observations = state.observations['DOLPHIN_SIGHTINGS']
+
+        if self.last_obs is None:
+            delta = 0
+            self.last_obs = observations
         else:
-            self.residual.pop(0)
-            self.residual.append(res)
+            delta = observations-self.last_obs
+            self.last_obs = observations
+        self.log.debug(LOG_VALUE, product, delta)
+        if delta>=5 or self.buy_gear:
+            self.buy_gear = True
+            self.sell_gear = False
+            self.log.info(LOG_SPIKE, product, delta, 1)
+            bid_product = "DIVING_GEAR"
+            order_size = min(-best_ask_volume_gear, assets[bid_product].limit - self.position[bid_product])
+            if order_size>0:
+                self.log.trade(LOG_ORDER, bid_product, best_ask_gear, order_size)
+                orders_gear.append(Order(bid_product, best_ask_gear, order_size))
+                try:
+                    second_vol = order_depth_gear.sell_orders[all_asks[1]]
+                    second_order_size = min(-second_vol, assets[bid_product].limit - self.position[bid_product]-order_size)
+                    self.log.trade(LOG_ORDER, bid_product, all_asks[1], second_order_size)
+                    orders_gear.append(Order(bid_product, all_asks[1], second_order_size))
+                except: pass
+            else:
+                self.sell_gear = False
+                self.buy_gear = False
+        if delta<= -5 or self.sell_gear:
+            self.sell_gear = True
+            self.buy_gear = False
+            self.log.info(LOG_SPIKE, product, delta, -1)
+            ask_product = "DIVING_GEAR"
+            order_size = min(best_bid_volume_gear,assets[ask_product].limit + self.position[ask_product])
+            if order_size>0:
+                self.log.trade(LOG_ORDER, ask_product, best_bid_gear, -order_size)
+                orders_gear.append(Order(ask_product, best_bid_gear, -order_size))
+                try:
+                    second_vol = order_depth_gear.buy_orders[all_bids[1]]
+                    second_order_size = min(second_vol,assets[ask_product].limit + self.position[ask_product]-order_size)
+                    self.log.trade(LOG_ORDER, ask_product, all_bids[1], -second_order_size)
+                    orders_gear.append(Order(ask_product, all_bids[1], -second_order_size))
+                except: pass
+            else:
+                self.sell_gear = False
+                self.buy_gear = False
+        result["DIVING_GEAR"] = orders_gear
+
+class SpreadStrategy(Strategy):
+    """STRAT 3 pairs trading COCONUTS and PINA_COLADAS, STRAT 6 ETF of picnic basket: the spreads of a SpreadBook"""
+    name = "spreads"
+    def __init__(self, book):
+        self.book = book
+        self.products = tuple(book.products)
+    def run(self, state, assets, result):
+        self.book.evaluate(state, assets, result, self.log)
 
 class Trader:
     """
     The trader class, containing a run method which runs the trading algo
     """
-    def __init__(self, assets = None, printing = True):
+    def __init__(self, assets = None, printing = True, budget = 0.05):
         if assets is None:
             assets = {
                 "PEARLS":Asset(20, 10, 10),
@@ -67,38 +1061,31 @@ class Trader:
             }
         self.asset_dicts = assets
         self.printing = printing
-        self.position = {"PEARLS": 0, "BANANAS": 0,
-                        "COCONUTS": 0, "PINA_COLADAS": 0,
-                        "BERRIES": 0, "DIVING_GEAR": 0,
-                        "DIP": 0, "BAGUETTE": 0, "UKULELE": 0, "PICNIC_BASKET": 0}
-        #berries
-        self.berries_highs = set()
-        self.berries_active = False
-
-        #coco-pina
-        self.short = False
-        self.long = False
-        self.resMA = 0
-        self.zscore = None
-        self.zscore_low = 0.5 #edit
-        self.zscore_high = 2.0
-
-        #dolphin diving gear
-        self.last_obs = None
-        self.buy_gear = False
-        self.sell_gear = False
+        #spreads: coco-pina pairs and the picnic basket etf, a Spread each
+        self.spreads = SpreadBook([
+            # SELL PINA BUY COCONUTS at a z-score of 2; hedge ratio COCO/PINA optimum calculated 1.87,
+            # signal="ols" takes it and the z-score from a rolling regression of PINA_COLADAS on COCONUTS instead
+            Spread("PAIRS", [("PINA_COLADAS", 1), ("COCONUTS", -1.875, 3)], sell_above=2.0, buy_below=-2.0,
+                   signal="zscore", history="COCONUTS", max_size=50, probe_size=5),
+            # SELL basket BUY components baguette dip ukulele 2:4:1 at a premium over 400, the reverse under 300.
+            # full_depth=True sizes through every visible level instead of the top of book
+            Spread("BASKET", [("PICNIC_BASKET", 1, 7), ("BAGUETTE", -2), ("DIP", -4), ("UKULELE", -1)],
+                   sell_above=400, buy_below=300),
+        ])
 
-    def get_data(self, order_depth):
-        if len(order_depth.sell_orders) > 0:
-            asks = sorted(order_depth.sell_orders.keys())
-            best_ask = asks[0]
-            best_ask_volume = order_depth.sell_orders[best_ask]
-        if len(order_depth.buy_orders) != 0:
-            bids = sorted(order_depth.buy_orders.keys(), reverse=True)
-            best_bid = bids[0]
-            best_bid_volume = order_depth.buy_orders[best_bid]
-            mid = (best_ask+best_bid)/2
-        return best_ask, best_ask_volume, best_bid, best_bid_volume, mid, asks, bids
+        # orders, misses, quotes and spikes are logged as compact records flushed once a run, see Logger;
+        # LOG_DEBUG adds the book volumes and the diving gear observation deltas
+        self.log = Logger(assets, LOG_INFO if printing else LOG_OFF)
+        # decayed flow and hit rate of each named bot in the market trades, for any strategy to query
+        self.counterparties = CounterpartyTracker()
+        # past budget seconds (50ms) into a run the berries and diving gear strategies are degraded, see
+        # StrategyRegistry; budget=None never degrades, as in the Backtester replays
+        self.strategies = StrategyRegistry([PearlsStrategy(), BananasStrategy(), BerriesStrategy(),
+                                            DivingGearStrategy(), SpreadStrategy(self.spreads)], budget=budget,
+                                           log=self.log, counterparties=self.counterparties)
+
+        # seconds spent in each strategy on the last run, read by benchmark.py
+        self.block_times = {}
 
     def run(self, state: TradingState) -> Dict[str, List[Order]]:
         """
@@ -108,475 +1095,7 @@ class Trader:
         assets = self.asset_dicts
         # Initialize the method output dict as an empty dict
         result = {}
-        # Iterate over all the keys (the available products) contained in the order depths
-        for product in state.order_depths.keys():
-            if product != 'DOLPHIN_SIGHTINGS':
-                self.position[product] = state.position.get(product, 0)
-            ''' STRAT 1 PEARLS: MM and spike misspricing  '''
-            if product == 'PEARLS':
-
-                # Retrieve the Order Depth containing all the market BUY and SELL orders for PEARLS
-                order_depth: OrderDepth = state.order_depths[product]
-                try:
-                    position = state.position[product]
-                except KeyError:
-                    position = 0
-                # Initialize the list of Orders to be sent as an empty list
-                orders: list[Order] = []
-
-                # Define a fair value for the PEARLS.
-                acceptable_price = 10000
-
-                # to see if there are available trades in the market
-                available_to_buy = False
-                available_to_sell = False
-
-                # If statement checks if there are any SELL orders in the PEARLS market
-                if len(order_depth.sell_orders) > 0:
-                    available_to_buy = True # other people are selling ergo we can buy
-                    # buy everything below our acceptable price
-                    asks = list(order_depth.sell_orders.keys())
-                    asks = sorted(asks)
-                    min_profit = 0
-                    for ask in asks:
-                        if ask < acceptable_price-min_profit:
-                            vol = order_depth.sell_orders[ask]
-                            order_size = min(-vol, assets[product].limit-position)
-                            if order_size > 0:
-                                position = position + order_size
-                                print("BUY", product, str(order_size) + "x", ask, 'position:', position)
-                                orders.append(Order(product, ask, order_size))
-                            else:
-                                print('MISSED buy of ',product, str(vol) + "x", ask, 'position:', position)
-                    assets[product].update_ask_prices(asks[0])
-
-                if len(order_depth.buy_orders) != 0:
-                    available_to_sell = True # other people are buying ergo we can sell
-                    # sell everything above our acceptable price
-                    bids = list(order_depth.buy_orders.keys())
-                    bids = sorted(bids, reverse=True)
-                    for bid in bids:
-                        if bid > acceptable_price:
-                            vol = order_depth.buy_orders[bid]
-                            order_size = min(vol, assets[product].limit+position)
-                            if order_size > 0:
-                                position = position - order_size
-                                print("SELL", product, str(order_size) + "x", bid,  'position:', position)
-                                orders.append(Order(product, bid, -order_size))
-                            else:
-                                print('MISSED sell of ',product, str(vol) + "x", bid, 'position:', position)
-                    assets[product].update_bid_prices(bids[0])
-
-                #MarketMaking
-                # Retrieve the Order Depth containing all the market BUY and SELL orders for PEARLS
-                ##########################################################
-                order_depth: OrderDepth = state.order_depths[product]
-                threshold = 6
-                spread = min(list(order_depth.sell_orders.keys()))-max(list(order_depth.buy_orders.keys()))
-                if spread >= threshold:
-                    #adjust volumes later
-                    #bid
-                    bid_size = np.floor(10*(1-position/20))
-                    if position != assets[product].limit and bid_size == 0:
-                        if spread >= threshold+2:
-                            bid_size = 1
-                    bid = max(order_depth.buy_orders.keys())+1
-                    orders.append(Order(product, bid, bid_size))
-                    #ask
-                    ask_size = -np.floor(10*(1+position/20))
-                    if position != assets[product].limit and ask_size == 0:
-                        if spread >= threshold+2:
-                            ask_size = 1
-                    ask = min(order_depth.sell_orders.keys())-1
-                    orders.append(Order(product, ask, ask_size))
-                    print('Spread:', spread, "MM BUY", product, str(bid_size) + "x", bid, 'position:', position, "MM SELL", product, str(-ask_size) + "x", ask,  'position:', position)
-                ##########################################################
-
-                # Add all the above orders to the result dict
-                result[product] = orders
-
-            ''' STRAT 2 BANANAS: MM and spike misspricing  '''
-            if product == 'BANANAS':
-
-                # Retrieve the Order Depth containing all the market BUY and SELL orders for PEARLS
-                order_depth: OrderDepth = state.order_depths[product]
-
-                try:
-                    position = state.position[product]
-                except KeyError:
-                    position = 0
-                # Initialize the list of Orders to be sent as an empty list
-                orders: list[Order] = []
-
-                # If statement checks if there are any SELL orders in the BANANAS market
-                if len(order_depth.sell_orders) > 0:
-                    best_ask = min(order_depth.sell_orders.keys())
-                    best_ask_volume = order_depth.sell_orders[best_ask]
-                    assets[product].update_ask_prices(best_ask)
-
-                if len(order_depth.buy_orders) != 0:
-                    best_bid = max(order_depth.buy_orders.keys())
-                    best_bid_volume = order_depth.buy_orders[best_bid]
-                    assets[product].update_bid_prices(best_bid)
-
-                spread = best_ask-best_bid
-                threshold = 5
-                if spread < threshold:
-                    if len(assets[product].ask_prices)>=assets[product].period:
-                        fast_avg = (sum(assets[product].ask_prices[-assets[product].fast_period:])+sum(assets[product].bid_prices[-assets[product].fast_period:]))/(2*assets[product].fast_period)
-                        #check for buy signal
-                        if fast_avg > best_ask:
-                            #available_to_buy = True
-                            order_size = min(-best_ask_volume, assets[product].limit-position)
-                            if order_size > 0:
-                                print("BUY", product, str(order_size) + "x", best_ask)
-                                orders.append(Order(product, best_ask, order_size))
-                        #check for sell signal
-                        elif fast_avg < best_bid:
-                            #available_to_sell = True
-                            order_size = min(best_bid_volume, assets[product].limit+position)
-                            if order_size > 0:
-                                print("SELL", product, str(order_size) + "x", best_bid)
-                                orders.append(Order(product, best_bid, -order_size))
-
-                ##########################################################
-                if spread >= threshold:
-                    #adjust volumes later
-                    #bid
-                    order_size = np.floor(5*(1-position/20)) #limtransform(position, 20, abs(best_bid_volume), abs(best_ask_volume)) #
-                    print('bid size',order_size)
-                    print('bid vol',best_bid_volume)
-                    print('ask vol',best_ask_volume)
-                    bid = max(order_depth.buy_orders.keys())+1
-                    orders.append(Order(product, bid, order_size))
-                    print(spread)
-                    print("MM BUY", product, str(order_size) + "x", bid, 'position:', position)
-                    #ask
-                    order_size = -np.floor(5*(1+position/20)) #-limtransform(-position, 20, abs(best_ask_volume), abs(best_bid_volume))  #
-                    ask = min(order_depth.sell_orders.keys())-1
-                    orders.append(Order(product, ask, order_size))
-                    print("MM SELL", product, str(-order_size) + "x", ask,  'position:', position)
-                ##########################################################
-
-                # Add all the above orders to the result dict
-                result[product] = orders
-
-            ''' STRAT 4 BERRIES: LONG from MM BUYS then max SHORT from midday peak  '''
-            if product == 'BERRIES':
-
-                # Retrieve the Order Depth containing all the market BUY and SELL orders for BERRIES
-                order_depth: OrderDepth = state.order_depths[product]
-
-                try:
-                    position = state.position[product]
-                except KeyError:
-                    position = 0
-                # Initialize the list of Orders to be sent as an empty list
-                orders: list[Order] = []
-
-                # If statement checks if there are any SELL orders in the BERRIES market
-                if len(order_depth.sell_orders) > 0:
-                    best_ask = min(order_depth.sell_orders.keys())
-                    best_ask_volume = order_depth.sell_orders[best_ask]
-                    assets[product].update_ask_prices(best_ask)
-
-                if len(order_depth.buy_orders) != 0:
-                    best_bid = max(order_depth.buy_orders.keys())
-                    best_bid_volume = order_depth.buy_orders[best_bid]
-                    assets[product].update_bid_prices(best_bid)
-
-                spread = best_ask-best_bid
-                threshold = 5
-                start = 480000    # with leway from min original 480000
-                duration = 40000  # original 40000
-                if (start < state.timestamp < start+duration): #if spread < threshold:
-                    if len(assets[product].ask_prices)>=assets[product].period:
-                        fast_avg = (sum(assets[product].ask_prices[-assets[product].fast_period:])+sum(assets[product].bid_prices[-assets[product].fast_period:]))/(2*assets[product].fast_period)
-                        #check for sell signal at midday highest price
-                        if (fast_avg - 1) < best_bid:
-
-                            self.berries_active = True
-                            order_size = min(best_bid_volume, assets[product].limit+position)
-                            if order_size > 0:
-                                print("SELL", product, str(order_size) + "x", best_bid)
-                                orders.append(Order(product, best_bid, -order_size))
-                            if len(self.berries_highs) == 0:
-                                self.berries_highs.add(best_bid)
-                            if (best_bid > min(self.berries_highs)):
-                                self.berries_highs.add(best_bid)
-                                if len(self.berries_highs) >= 5:
-                                    self.berries_highs.remove(min(self.berries_highs))
-
-                        #sell signal based off new high #elif, dont want if already above loop run
-                        elif self.berries_active:
-                            if (best_bid > min(self.berries_highs)):
-                                order_size = min(best_bid_volume, assets[product].limit+position)
-                                if order_size > 0:
-                                    print("SELL", product, str(order_size) + "x", best_bid)
-                                    orders.append(Order(product, best_bid, -order_size))
-                                self.berries_highs.add(best_bid)
-                                if len(self.berries_highs) >= 5:
-                                    self.berries_highs.remove(min(self.berries_highs))
-
-                        #check for buy signal
-                        elif fast_avg > best_ask and state.timestamp < 400000:
-                            #available_to_buy = True
-                            order_size = min(-best_ask_volume, assets[product].limit-position)
-                            if order_size > 0:
-                                print("BUY", product, str(order_size) + "x", best_ask)
-                                orders.append(Order(product, best_ask, order_size))
-
-                ##########################################################
-                if spread >= threshold and state.timestamp < 400000:
-                    #adjust volumes later
-                    #bid                 #50
-                    order_size = np.floor(10*(1-position/250)) #change size 5
-                    if position != 250 and order_size == 0:
-                        order_size = np.floor((250-position)/2)
-                        if position != 250 and order_size == 0:
-                            order_size = 1
-                    bid = max(order_depth.buy_orders.keys())+1
-                    orders.append(Order(product, bid, order_size))
-                    print(spread)
-                    print("MM BUY", product, str(order_size) + "x", bid, 'position:', position)
-                    #ask
-                    order_size = -np.floor(10*(1+position/250)) #change size 5
-                    ask = min(order_depth.sell_orders.keys())-1
-                    orders.append(Order(product, ask, order_size))
-                    print("MM SELL", product, str(-order_size) + "x", ask,  'position:', position)
-                ##########################################################
-
-                # Add all the above orders to the result dict
-                result[product] = orders
-
-            ''' STRAT 5 DOLPHIN_SIGHTINGS peak DIVING_GEAR'''
-            if product == 'DIVING_GEAR':
-                order_depth_gear = state.order_depths["DIVING_GEAR"]
-                best_ask_gear, best_ask_volume_gear, best_bid_gear, best_bid_volume_gear, _, all_asks, all_bids = self.get_data(order_depth_gear)
-                # Initialize the method output dict as an empty dict
-                orders_gear: list[Order] = []
-
-                self.position[product] = state.position.get(product, 0)
-                observations = state.observations['DOLPHIN_SIGHTINGS']
-
-                if self.last_obs is None:
-                    delta = 0
-                    self.last_obs = observations
-                else:
-                    delta = observations-self.last_obs
-                    self.last_obs = observations
-                print(delta)
-                if delta>=5 or self.buy_gear:
-                    self.buy_gear = True
-                    self.sell_gear = False
-                    print('spike up')
-                    print('buy diving gear')
-                    bid_product = "DIVING_GEAR"
-                    print(best_ask_gear)
-                    print(all_asks)
-                    order_size = min(-best_ask_volume_gear, assets[bid_product].limit - self.position[bid_product])
-                    if order_size>0:
-                        print("BUY", bid_product, str(order_size) + "x", best_ask_gear)
-                        orders_gear.append(Order(bid_product, best_ask_gear, order_size))
-                        try:
-                            second_vol = order_depth_gear.sell_orders[all_asks[1]]
-                            second_order_size = min(-second_vol, assets[bid_product].limit - self.position[bid_product]-order_size)
-                            print("BUY", bid_product, str(second_order_size) + "x", all_asks[1])
-                            orders_gear.append(Order(bid_product, all_asks[1], second_order_size))
-                        except: pass
-                    else:
-                        self.sell_gear = False
-                        self.buy_gear = False
-                    print(delta)
-                if delta<= -5 or self.sell_gear:
-                    self.sell_gear = True
-                    self.buy_gear = False
-                    print('spike down')
-                    print('sell diving gear')
-                    ask_product = "DIVING_GEAR"
-                    print(best_bid_gear)
-                    print(all_bids)
-                    order_size = min(best_bid_volume_gear,assets[ask_product].limit + self.position[ask_product])
-                    if order_size>0:
-                        print("SELL", ask_product, str(order_size) + "x", best_bid_gear)
-                        orders_gear.append(Order(ask_product, best_bid_gear, -order_size))
-                        try:
-                            second_vol = order_depth_gear.buy_orders[all_bids[1]]
-                            second_order_size = min(second_vol,assets[ask_product].limit + self.position[ask_product]-order_size)
-                            print("SELL", ask_product, str(second_order_size) + "x", all_bids[1])
-                            orders_gear.append(Order(ask_product, all_bids[1], -second_order_size))
-                        except: pass
-                    else:
-                        self.sell_gear = False
-                        self.buy_gear = False
-                    print(delta)
-                result["DIVING_GEAR"] = orders_gear
-
-        ''' STRAT 3 pairs trading COCONUTS and PINA_COLADAS '''
-        # hedge ratio COCO/PINA optimum calculated 1.87
-        hedge_ratio = 1.875
-        orders_coconut: list[Order] = []
-        orders_pina: list[Order] = []
-        order_depth_coconut = state.order_depths["COCONUTS"]
-        best_ask_coconut, best_ask_volume_coconut, best_bid_coconut, best_bid_volume_coconut, mid_coconut, _, _ = self.get_data(
-            order_depth_coconut)
-        position_coconut = state.position.get('COCONUTS', 0)
-        order_depth_pina = state.order_depths["PINA_COLADAS"]
-        best_ask_pina, best_ask_volume_pina, best_bid_pina, best_bid_volume_pina, mid_pina, _, _ = self.get_data(
-            order_depth_pina)
-        position_pina = state.position.get('PINA_COLADAS', 0)
-        data_ready = False
-        # Calculate residuals
-        if mid_coconut is not None and mid_pina is not None:
-            res = mid_pina - hedge_ratio * mid_coconut
-            assets['COCONUTS'].update_residual(res)
-
-        period = 670 # adjust
-        if len(assets['COCONUTS'].residual) >= period:
-            self.resMA = np.mean(assets['COCONUTS'].residual)
-            self.zscore = (res-self.resMA)/np.std(assets['COCONUTS'].residual)
-            print('ready to trade')
-            data_ready = True
-
-        if data_ready:
-            # entry signal SHORT res
-            if self.zscore >= self.zscore_high and not self.short: # and self.zscore<self.last_zscore:
-                # SELL PINA overpriced, BUY COCONUT underpriced; pina and coconut volume 1:2
-                #self.short = True   # allow multiple trades
-                bid_product = "COCONUTS"
-                ask_product = "PINA_COLADAS"
-                bid_volume = min(-best_ask_volume_coconut, assets[bid_product].limit - position_coconut)
-                ask_volume = min(best_bid_volume_pina, assets[ask_product].limit + position_pina)
-                max_available = np.floor(min(bid_volume/hedge_ratio, ask_volume)) #max avaialable
-                pina_order_size = min(50, max_available)
-                if abs(position_pina)<assets['PINA_COLADAS'].limit and pina_order_size == 0:
-                    pina_order_size = min(5, assets['PINA_COLADAS'].limit-abs(position_pina))
-                # trade possible if size is positive and spread not too big
-                spread = max(best_ask_pina-best_bid_pina, best_ask_coconut-best_bid_coconut)
-                spread_coconut = best_ask_coconut-best_bid_coconut
-                if pina_order_size > 0 and spread_coconut <= 2:
-                    print("BUY", bid_product, str(hedge_ratio*pina_order_size) + "x", best_ask_coconut)
-                    orders_coconut.append(Order(bid_product, best_ask_coconut, np.round(hedge_ratio*pina_order_size)))
-                    print("SELL", ask_product, str(pina_order_size) + "x", best_bid_pina)
-                    orders_pina.append(Order(ask_product, best_bid_pina, -pina_order_size))
-            #entry signal LONG res
-            elif self.zscore <= -self.zscore_high and not self.long: # and self.zscore>self.last_zscore:
-                # SELL COCONUT overpriced, BUY PINA underpriced,
-                #self.long = True   # allow multiple trades
-                bid_product = "PINA_COLADAS"
-                ask_product = "COCONUTS"
-                bid_volume = min(-best_ask_volume_pina, assets[bid_product].limit - position_pina)
-                ask_volume = min(best_bid_volume_coconut, assets[ask_product].limit + position_coconut)
-                max_available = np.floor(min(bid_volume, ask_volume/hedge_ratio))
-                pina_order_size = min(50, max_available)
-                if abs(position_pina)<assets['PINA_COLADAS'].limit and pina_order_size == 0:
-                    pina_order_size = min(5, assets['PINA_COLADAS'].limit-abs(position_pina))
-                # trade possible if size is positive
-                spread = max(best_ask_pina-best_bid_pina, best_ask_coconut-best_bid_coconut)
-                spread_coconut = best_ask_coconut-best_bid_coconut
-                if pina_order_size > 0 and spread_coconut <= 2:
-                    print("BUY", bid_product, str(pina_order_size) + "x", best_ask_pina)
-                    orders_pina.append(Order(bid_product, best_ask_pina, pina_order_size))
-                    print("SELL", ask_product, str(hedge_ratio*pina_order_size) + "x", best_bid_coconut)
-                    orders_coconut.append(Order(ask_product, best_bid_coconut, -np.round(hedge_ratio*pina_order_size)))
-
-            print('Pos_pina:', position_pina)
-            print('Pos_coco:', position_coconut)
-
-
-            # Add all the above orders to the result dict
-            result["COCONUTS"] = orders_coconut
-            result["PINA_COLADAS"] = orders_pina
-
-        ''' STRAT 6 ETF of picnic basket '''
-        orders_dip: list[Order] = []
-        orders_baguette: list[Order] = []
-        orders_ukulele: list[Order] = []
-        orders_basket: list[Order] = []
-
-        #get data
-        order_depth_dip = state.order_depths["DIP"]
-        best_ask_dip, best_ask_volume_dip, best_bid_dip, best_bid_volume_dip, mid_dip, _, __ = self.get_data(
-            order_depth_dip)
-        order_depth_baguette = state.order_depths["BAGUETTE"]
-        best_ask_baguette, best_ask_volume_baguette, best_bid_baguette, best_bid_volume_baguette, mid_baguette, _, __ = self.get_data(
-            order_depth_baguette)
-        order_depth_ukulele = state.order_depths["UKULELE"]
-        best_ask_ukulele, best_ask_volume_ukulele, best_bid_ukulele, best_bid_volume_ukulele, mid_ukulele, _, __ = self.get_data(
-            order_depth_ukulele)
-        order_depth_basket = state.order_depths["PICNIC_BASKET"]
-        best_ask_basket, best_ask_volume_basket, best_bid_basket, best_bid_volume_basket, mid_basket, _, __ = self.get_data(
-            order_depth_basket)
-
-        #positions
-        position_baguette = state.position.get('BAGUETTE', 0)
-        position_dip = state.position.get('DIP', 0)
-        position_ukulele = state.position.get('UKULELE', 0)
-        position_basket = state.position.get('PICNIC_BASKET', 0)
-
-        # check all data ready
-        if all([mid_dip, mid_baguette, mid_ukulele, mid_basket]) is not None:
-            #redem is short basket long components
-            best_ask_components = 2*best_ask_baguette + 4*best_ask_dip + best_ask_ukulele
-            residual = best_bid_basket-best_ask_components
-
-            threshold = 7
-            spread = best_ask_basket-best_bid_basket
-            #residual strat
-            if spread < threshold:
-                sell_range = 400
-                buy_range = 300
-                # buy signal
-                if residual > sell_range:
-                    # SELL basket BUY components baguette dip ukulele 2:4:1
-                    #component vol is of ukuleles
-                    component_volume  = min(np.floor(-best_ask_volume_baguette/2),  np.floor(-best_ask_volume_dip/4), -best_ask_volume_ukulele)
-                    component_volume_lim = min(assets['BAGUETTE'].limit - position_baguette,
-                                               assets['DIP'].limit - position_dip,
-                                               assets['UKULELE'].limit - position_ukulele)
-                    bid_volume = min(component_volume, component_volume_lim)
-                    ask_volume = min(best_bid_volume_basket, assets['PICNIC_BASKET'].limit + position_basket)
-                    basket_order_size = np.floor(min(bid_volume, ask_volume))
-                    # trade possible if size is positive
-                    if basket_order_size > 0:
-                        print("BUY BAGUETTE", str(2*basket_order_size) + "x", best_ask_baguette)
-                        orders_baguette.append(Order('BAGUETTE', best_ask_baguette, 2*basket_order_size))
-                        print("BUY DIP", str(4*basket_order_size) + "x", best_ask_dip)
-                        orders_dip.append(Order('DIP', best_ask_dip, 4*basket_order_size))
-                        print("BUY UKULELE", str(basket_order_size) + "x", best_ask_ukulele)
-                        orders_ukulele.append(Order('UKULELE', best_ask_ukulele, basket_order_size))
-                        print("SELL PICNIC_BASKET", str(basket_order_size) + "x", best_bid_basket)
-                        orders_basket.append(Order('PICNIC_BASKET', best_bid_basket, -basket_order_size))
-                # sell signal
-                elif residual < buy_range:
-                    # BUY basket SELL components baguette dip ukulele 2:4:1
-                    #component vol is of ukuleles
-                    component_volume  = min(np.floor(best_bid_volume_baguette/2),  np.floor(best_bid_volume_dip/4), best_bid_volume_ukulele)
-                    component_volume_lim = min(assets['BAGUETTE'].limit + position_baguette,
-                                               assets['DIP'].limit + position_dip,
-                                               assets['UKULELE'].limit + position_ukulele)
-                    bid_volume = min(-best_ask_volume_basket, assets['PICNIC_BASKET'].limit - position_basket)
-                    ask_volume = min(component_volume, component_volume_lim)
-                    basket_order_size = np.floor(min(bid_volume, ask_volume))
-                    # trade possible if size is positive
-                    if basket_order_size > 0:
-                        print("SELL BAGUETTE", str(2*basket_order_size) + "x", best_bid_baguette)
-                        orders_baguette.append(Order('BAGUETTE', best_bid_baguette, -2*basket_order_size))
-                        print("SELL DIP", str(4*basket_order_size) + "x", best_bid_dip)
-                        orders_dip.append(Order('DIP', best_bid_dip, -4*basket_order_size))
-                        print("SELL UKULELE", str(basket_order_size) + "x", best_bid_ukulele)
-                        orders_ukulele.append(Order('UKULELE', best_bid_ukulele, -basket_order_size))
-                        print("BUY PICNIC_BASKET", str(basket_order_size) + "x", best_ask_basket)
-                        orders_basket.append(Order('PICNIC_BASKET', best_ask_basket, basket_order_size))
-            #MM strat
-            elif spread > threshold:
-                #MM strategy
-                m=0
-            # Add all the above orders to the result dict
-            result["BAGUETTE"] = orders_baguette
-            result["DIP"] = orders_dip
-            result["UKULELE"] = orders_ukulele
-            result["PICNIC_BASKET"] = orders_basket
-            print(f'Position in basket: {position_basket}')
+        self.strategies.run(state, assets, result, self.block_times)
+        self.log.flush(state.timestamp)
         # Return the dict of orders
         return result
\ No newline at end of file
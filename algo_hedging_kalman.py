@@ -23,88 +23,144 @@ class MyKalmanFilter:
         # measurement noise variance
         self.R = R
 
-        # co-variance of process noise(2 dimensions)
-        self.Q = delta / (1-delta) * np.eye(mem)
-
-        # previous state
-        self.x = np.zeros((mem, 1))
-
-        # keeps track of y2
-        self.y2 = [0] * mem
-
-        # keeps track of y2
-        self.y2 = [0] * mem
-
-        # state covariance
-        self.P = np.zeros((mem,mem))
+        # co-variance of process noise (mem dimensions), only its diagonal q is added each step
+        self.q = delta / (1-delta)
+        self.Q = self.q * np.eye(mem)
+
+        # state covariance and previous state side by side as [P | x], so one rank 1 update moves both
+        self.Px = np.zeros((mem, mem+1))
+        self.P = self.Px[:, :mem]
+        self.x = self.Px[:, mem:]
+        self.P_diagonal = self.Px.reshape(-1)[::mem+2]
+
+        # the last mem y2 written twice, mem apart, so self.y2_buffer[end-mem:end] is always H
+        self.y2_buffer = np.zeros(2*mem)
+        self.end = mem
+
+        # preallocated per step results
+        self.row = np.zeros(mem+1)
+        self.row_2d = self.row[None]
+        self.K = np.zeros((mem, 1))
+        self.k = self.K[:, 0]
+        self.update = np.zeros((mem, mem+1))
 
     def step_forward(self, y1, y2):
-        self.y2.pop(0)
-        self.y2.append(y2)
-
-        # Before entering the equations, let's define H as (1, 2) matrix
-        H = np.array(self.y2)[None]
-        # and define z
-        z = y1
+        """
+        one filter step without allocating, returning the measurement estimate z_hat.
+        x, P and K are views of buffers that the next step overwrites
+        """
+        mem = self.mem
+        if self.end == 2*mem:
+            self.end = mem
+        self.y2_buffer[self.end - mem] = y2
+        self.y2_buffer[self.end] = y2
+        self.end += 1
+        H = self.y2_buffer[self.end - mem:self.end]
 
         ## TIME UPDATE ##
-        # first thing is to predict new state as the previous one (2x1)
-        x_hat = self.x
-
-        # then, the uncertainty or covariance prediction
-        P_hat = self.P + self.Q
+        # the state prediction is the previous state, the covariance prediction P + Q
+        np.add(self.P_diagonal, self.q, out=self.P_diagonal)
 
         ## MEASUREMENT UPDATE ##
-        # calc the Kalman gain
-        K = P_hat.dot(H.T)/(H.dot(P_hat.dot(H.T))+self.R)
-
-        # state update part 1 (measurement estimation)
-        z_hat = H.dot(x_hat)
-
-        # state update part 2
-        x = x_hat + K.dot(z-z_hat)
-
-        # uncertainty update
-        self.P = (np.eye(self.mem)-K.dot(H)).dot(P_hat)
-
-        # refresh the previous state
-        self.x = x
-
-        return x, self.P, K, z_hat
+        # H [P_hat | x]: H P_hat, which is (P_hat H')' as P_hat is symmetric, and z_hat = H x
+        row = self.row
+        np.dot(H, self.Px, out=row)
+        HP = row[:mem]
+        z_hat = float(row[mem])
+        # Kalman gain
+        np.multiply(HP, 1/(HP.dot(H)+self.R), out=self.k)
+        # x = x_hat + K (z - z_hat) and P = (I - K H) P_hat = P_hat - K (H P_hat) in one go
+        row[mem] = z_hat - y1
+        np.dot(self.K, self.row_2d, out=self.update)
+        np.subtract(self.Px, self.update, out=self.Px)
+        return z_hat
+
+class History:
+    """
+    the capacity most recent values in a ring buffer, with a running mean and variance.
+    every value is written twice, capacity apart, so the window is always one contiguous slice
+    and values() and last(k) are views rather than copies
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = np.zeros(2*capacity)
+        self.end = capacity
+        self.count = 0
+        self.running_mean = 0.0
+        self.m2 = 0.0
+    def append(self, value):
+        """add a value, dropping the oldest once full, in O(1)"""
+        capacity = self.capacity
+        if self.end == 2*capacity:
+            self.end = capacity
+        oldest = self.buffer[self.end - capacity]
+        self.buffer[self.end - capacity] = value
+        self.buffer[self.end] = value
+        self.end += 1
+        if self.count < capacity:
+            # welford
+            self.count += 1
+            delta = value - self.running_mean
+            self.running_mean += delta/self.count
+            self.m2 += delta*(value - self.running_mean)
+        else:
+            # sliding welford: value replaces oldest
+            mean = self.running_mean + (value - oldest)/capacity
+            self.m2 += (value - oldest)*(value - mean + oldest - self.running_mean)
+            self.running_mean = mean
+            if self.end == 2*capacity:
+                # resync once per lap so rounding cannot build up
+                window = self.values()
+                self.running_mean = float(window.mean())
+                self.m2 = float(((window - self.running_mean)**2).sum())
+    def __len__(self):
+        return self.count
+    def values(self):
+        """the window oldest first, a view"""
+        return self.buffer[self.end - self.count:self.end]
+    def last(self, k):
+        """the k most recent values oldest first, a view"""
+        return self.buffer[self.end - min(k, self.count):self.end]
+    def __getitem__(self, key):
+        return self.values()[key]
+    @property
+    def mean(self):
+        return self.running_mean
+    @property
+    def std(self):
+        """population standard deviation, as np.std"""
+        return np.sqrt(max(self.m2, 0.0)/self.count) if self.count else np.nan
+    def zscore(self, value):
+        return (value - self.running_mean)/self.std
 
 # asset class: stores info about an asset not in the datamodel
 class Asset:
     """asset class to contain previous prices, and the limits for an asset"""
     def __init__(self, limit, period, fast_period):
         self.limit = limit
-        self.ask_prices = []
-        self.bid_prices = []
-        self.residual = []
         self.last_mid = None
         self.period = period
         self.fast_period = fast_period
+    @property
+    def period(self):
+        return self._period
+    @period.setter
+    def period(self, period):
+        """a new period starts the histories afresh"""
+        self._period = period
+        self.ask_prices = History(period)
+        self.bid_prices = History(period)
+        self.residual = History(period)
     def update_ask_prices(self, ask_price):
         """update the period most recent ask prices"""
-        if len(self.ask_prices)<self.period:
-            self.ask_prices.append(ask_price)
-        else:
-            self.ask_prices.pop(0)
-            self.ask_prices.append(ask_price)
+        self.ask_prices.append(ask_price)
     def update_bid_prices(self, bid_price):
         """update the period most recent bid prices"""
-        if len(self.bid_prices)<self.period:
-            self.bid_prices.append(bid_price)
-        else:
-            self.bid_prices.pop(0)
-            self.bid_prices.append(bid_price)
+        self.bid_prices.append(bid_price)
 
     def update_residual(self, res):
         """update the most recent residuals"""
-        if len(self.residual)<self.period:
-            self.residual.append(res)
-        else:
-            self.residual.pop(0)
-            self.residual.append(res)
+        self.residual.append(res)
 
 
 
@@ -174,13 +230,13 @@ class Trader:
         hedge_ratio = 1.875
         if mid_coconut is not None and mid_pina is not None:
             # when we short the spread we sell pina at best bid and buy coco at best ask
-            _, _, _, z_hat = mkf_short.step_forward(best_bid_pina, best_ask_coconut) # x, _, _, z_hat = mkf_short.step_forward(best_bid_pina, best_ask_coconut)
+            z_hat = mkf_short.step_forward(best_bid_pina, best_ask_coconut)
             # hedge_ratio_short = x[0].squeeze()
-            self.zscore_short = (best_bid_pina - z_hat.squeeze())/1.7
+            self.zscore_short = (best_bid_pina - z_hat)/1.7
             # when we long the spread we buy pina at best ask and sell coco at best bid
-            _, _, _, z_hat = mkf_long.step_forward(best_ask_pina, best_bid_coconut)
+            z_hat = mkf_long.step_forward(best_ask_pina, best_bid_coconut)
             # hedge_ratio_short = x[0].squeeze()
-            self.zscore_long = (best_ask_pina - z_hat.squeeze())/1.7
+            self.zscore_long = (best_ask_pina - z_hat)/1.7
         # print(self.zscore_short, self.zscore_long)
         if state.timestamp==10000:
             self.burnt_in = True
@@ -0,0 +1,102 @@
+"""
+Currency round trip solver for the manual trading rounds, in place of the itertools.product search of manual_trading.ipynb
+rates[i][j] is what one unit of currency i buys of currency j, 0 where there is no market. A route of h hops starts
+and ends at the same currency and its multiplier is the product of the h rates along it. In log space that is a
+longest path of exactly h edges, found by dynamic programming over the hops: the best top routes into every currency
+after each hop, kept as a (top, n) table with back pointers, so the work is hops * top * n^2 instead of n^hops.
+the notebook's search is best_routes(rates, "shell", 5) with the currencies staying put on the diagonal rate of 1
+"""
+
+import sys
+from time import perf_counter
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+
+class Route(NamedTuple):
+    path: tuple
+    multiplier: float
+
+
+def _log_rates(rates):
+    rates = np.asarray(rates, dtype=np.float64)
+    if rates.ndim != 2 or rates.shape[0] != rates.shape[1]:
+        raise ValueError("rates must be a square matrix")
+    with np.errstate(divide="ignore"):
+        return np.where(rates > 0, np.log(np.where(rates > 0, rates, 1)), -np.inf)
+
+
+def best_routes(rates, start, hops, top=1, currencies: Sequence[str] = None, exact=True) -> List[Route]:
+    """
+    the top round trips from start, best first, of exactly hops trades, or of 1 to hops trades if exact is false.
+    start is an index, or a name of currencies. paths are tuples of names if currencies are given, else of indices.
+    fewer than top routes come back if fewer exist
+    """
+    log_rates = _log_rates(rates)
+    n = len(log_rates)
+    if currencies is not None:
+        if len(currencies) != n:
+            raise ValueError(f"{len(currencies)} currencies for a {n}x{n} rate matrix")
+        if not isinstance(start, (int, np.integer)):
+            start = list(currencies).index(start)
+    if hops < 1 or top < 1:
+        raise ValueError("hops and top must be at least 1")
+
+    # score[r, v]: log multiplier of the r-th best walk from start to v in h hops
+    score = np.full((top, n), -np.inf)
+    score[0, start] = 0.0
+    # back[h][r, v] = r' * n + u: that walk came from the r'-th best walk to u after h hops
+    back = []
+    # (log multiplier, hops, rank) of the walks back at start
+    finished = []
+    for h in range(1, hops + 1):
+        candidates = (score[:, :, None] + log_rates[None, :, :]).reshape(top * n, n)
+        if top < top * n:
+            chosen = np.argpartition(-candidates, top - 1, axis=0)[:top]
+        else:
+            chosen = np.broadcast_to(np.arange(top)[:, None], (top, n)).copy()
+        values = np.take_along_axis(candidates, chosen, axis=0)
+        order = np.argsort(-values, axis=0, kind="stable")
+        chosen = np.take_along_axis(chosen, order, axis=0)
+        score = np.take_along_axis(values, order, axis=0)
+        back.append(chosen)
+        if h == hops or not exact:
+            finished += [(score[r, start], h, r) for r in range(top) if score[r, start] > -np.inf]
+
+    finished.sort(key=lambda f: -f[0])
+    routes = []
+    for value, h, rank in finished[:top]:
+        path = [start]
+        node = start
+        for step in range(h - 1, -1, -1):
+            i = int(back[step][rank, node])
+            rank, node = divmod(i, n)
+            path.append(node)
+        path.reverse()
+        if currencies is not None:
+            path = [currencies[i] for i in path]
+        routes.append(Route(tuple(path), float(np.exp(value))))
+    return routes
+
+
+def best_route(rates, start, hops, currencies: Sequence[str] = None, exact=True) -> Route:
+    """the best round trip from start, see best_routes; None if there is none"""
+    routes = best_routes(rates, start, hops, 1, currencies, exact)
+    return routes[0] if routes else None
+
+
+if __name__ == "__main__":
+    # the rates of manual_trading.ipynb
+    currencies = ["pizza", "wasabi", "snowball", "shell"]
+    rates = [[1, 0.5, 1.45, 0.75],
+             [1.95, 1, 3.1, 1.49],
+             [0.67, 0.31, 1, 0.48],
+             [1.34, 0.64, 1.98, 1]]
+    hops = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    start = perf_counter()
+    routes = best_routes(rates, "shell", hops, top=5, currencies=currencies)
+    elapsed = perf_counter() - start
+    for route in routes:
+        print(f"{route.multiplier:.6f} {' -> '.join(route.path)}")
+    print(f"{hops} hops in {elapsed * 1e3:.2f}ms")
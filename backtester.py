@@ -0,0 +1,264 @@
+"""
+Local replay of the Data/prices_round_*_day_*.csv books through any Trader in the repo
+Rebuilds a TradingState per timestamp and times the strategy against the replay overhead
+"""
+
+import os
+import sys
+import importlib
+import importlib.util
+import contextlib
+from time import perf_counter
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from datamodel import Listing, TradingState, Order, Trade
+from orderbook import SortedOrderDepth
+from matching import DEFAULT_LIMITS, TradeTape, match_orders, fills_to_trades
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data")
+TRADES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "TradesData")
+
+# column order of one book row: bid price/volume x3 then ask price/volume x3, as in the csv
+LEVEL_COLUMNS = ["bid_price_1", "bid_volume_1", "bid_price_2", "bid_volume_2", "bid_price_3", "bid_volume_3",
+                 "ask_price_1", "ask_volume_1", "ask_price_2", "ask_volume_2", "ask_price_3", "ask_volume_3"]
+
+# products that are published as a number in the price file rather than traded
+OBSERVATION_PRODUCTS = ("DOLPHIN_SIGHTINGS",)
+
+
+def price_file(round_no, day):
+    """path of the price file for a round and day"""
+    return os.path.join(DATA_DIR, f"prices_round_{round_no}_day_{day}.csv")
+
+
+def trades_file(round_no, day, names=False):
+    """path of the market trades file for a round and day, names=True for the file with buyers and sellers"""
+    if names:
+        return os.path.join(TRADES_DIR, "island-data-bottle-round-5", f"trades_round_{round_no}_day_{day}_wn.csv")
+    return os.path.join(TRADES_DIR, f"trades_round_{round_no}_day_{day}_nn.csv")
+
+
+class PriceBook:
+    """
+    the price file of one day held as arrays: timestamps (T,), and per product
+    a (T, 12) int array of book levels in LEVEL_COLUMNS order and a (T,) float mid price.
+    missing levels have price 0 and volume 0
+    """
+    def __init__(self, day, timestamps, products, levels, mid):
+        self.day = day
+        self.timestamps = timestamps
+        self.products = products
+        self.levels = levels
+        self.mid = mid
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def from_frame(cls, df):
+        """build from a dataframe read from a price file"""
+        day = int(df["day"].iloc[0])
+        timestamps = np.unique(df["timestamp"].to_numpy())
+        products = list(dict.fromkeys(df["product"]))
+        levels = {}
+        mid = {}
+        for product, frame in df.groupby("product", sort=False):
+            # scatter onto the full timestamp grid in case a product skips a tick
+            rows = np.searchsorted(timestamps, frame["timestamp"].to_numpy())
+            product_levels = np.zeros((len(timestamps), len(LEVEL_COLUMNS)), dtype=np.int32)
+            product_levels[rows] = frame[LEVEL_COLUMNS].fillna(0).to_numpy(dtype=np.int32)
+            product_mid = np.full(len(timestamps), np.nan)
+            product_mid[rows] = frame["mid_price"].to_numpy(dtype=np.float64)
+            levels[product] = product_levels
+            mid[product] = product_mid
+        return cls(day, timestamps, products, levels, mid)
+
+    @classmethod
+    def from_csv(cls, path):
+        """read a semicolon separated price file"""
+        return cls.from_frame(pd.read_csv(path, sep=";"))
+
+
+def order_depth_from_levels(row):
+    """build a SortedOrderDepth from one (12,) row of book levels as a python list"""
+    return SortedOrderDepth.from_levels(row)
+
+
+def iter_states(book: PriceBook):
+    """yield a TradingState for every timestamp of the book, with no trades and no positions"""
+    products = book.products
+    traded = [p for p in products if p not in OBSERVATION_PRODUCTS]
+    observed = [p for p in products if p in OBSERVATION_PRODUCTS]
+    listings = {p: Listing(p, p, "SEASHELLS") for p in products}
+    # tolist once up front so the per tick work is on python ints, not numpy scalars
+    levels = {p: book.levels[p].tolist() for p in traded}
+    mids = {p: book.mid[p].tolist() for p in observed}
+    for t, timestamp in enumerate(book.timestamps.tolist()):
+        order_depths = {p: order_depth_from_levels(levels[p][t]) for p in traded}
+        for p in observed:
+            order_depths[p] = SortedOrderDepth()
+        yield TradingState(timestamp, listings, order_depths,
+                           {p: [] for p in products}, {p: [] for p in products},
+                           {}, {p: mids[p][t] for p in observed})
+
+
+def load_trader(name, **kwargs):
+    """instantiate the Trader of a module name (algo_final) or file path (Old_Strats/algo.py)"""
+    if name.endswith(".py"):
+        module_name = os.path.splitext(os.path.basename(name))[0]
+        spec = importlib.util.spec_from_file_location(module_name, name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(name)
+    return module.Trader(**kwargs)
+
+
+class BacktestResult:
+    """orders sent, fills, positions and time spent per tick of a replay"""
+    def __init__(self, timestamps, products, orders, own_trades, positions, pnl, strategy_time, total_time):
+        self.timestamps = timestamps
+        self.products = products
+        self.orders: List[Dict[str, List[Order]]] = orders
+        self.own_trades: List[Dict[str, List[Trade]]] = own_trades
+        self.positions = positions
+        self.pnl = pnl
+        self.strategy_time = strategy_time
+        self.total_time = total_time
+
+    @property
+    def overhead(self):
+        """seconds spent outside Trader.run"""
+        return self.total_time - float(np.sum(self.strategy_time))
+
+    def final_pnl(self):
+        """profit and loss per product at the last tick, marked to the mid"""
+        return {p: float(self.pnl[-1, i]) for i, p in enumerate(self.products)}
+
+    def summary(self):
+        n_orders = sum(len(o) for tick in self.orders for o in tick.values())
+        n_fills = sum(len(t) for tick in self.own_trades for t in tick.values())
+        return (f"{len(self.timestamps)} ticks, {n_orders} orders, {n_fills} fills, "
+                f"pnl {np.nansum(self.pnl[-1]):.1f}, "
+                f"strategy {np.sum(self.strategy_time):.3f}s, overhead {self.overhead:.3f}s")
+
+
+class Backtester:
+    """
+    replays a PriceBook through a trader, calling trader.run once per timestamp.
+    orders are matched against the book and, if a TradeTape is given, the market trades at the
+    same timestamp; the fills come back in the next state as own_trades and position.
+    limits default to the trader's Asset limits, then DEFAULT_LIMITS.
+    stdout from the trader is discarded unless log is a file-like object to write it to.
+    deterministic turns off the time budget of a trader with a strategy registry, so the orders of a replay
+    do not depend on how busy the machine is
+    """
+    def __init__(self, trader, book: PriceBook, tape: TradeTape = None, limits=None, log=None, deterministic=True):
+        self.trader = trader
+        registry = getattr(trader, "strategies", None)
+        if deterministic and hasattr(registry, "budget"):
+            registry.budget = None
+        self.book = book
+        self.tape = tape
+        if limits is None:
+            limits = dict(DEFAULT_LIMITS)
+            for product, asset in getattr(trader, "asset_dicts", {}).items():
+                limits[product] = asset.limit
+        self.limits = limits
+        self.log = log
+
+    def run(self):
+        book = self.book
+        tape = self.tape
+        timestamps = book.timestamps
+        products = book.products
+        traded = [p for p in products if p not in OBSERVATION_PRODUCTS]
+        index = {p: i for i, p in enumerate(products)}
+        # python lists up front: the matching walks a few levels and prints a tick, where indexing
+        # (memory mapped) arrays costs more than the work
+        levels = {p: np.asarray(book.levels[p]).tolist() for p in traded}
+        limits = self.limits
+        # per product trade tape bounds for every tick
+        bounds = {}
+        tape_prices, tape_quantities = {}, {}
+        if tape is not None:
+            for p in traded:
+                bounds[p] = tape.slices(p, timestamps)
+                if p in tape.prices:
+                    tape_prices[p] = np.asarray(tape.prices[p]).tolist()
+                    tape_quantities[p] = np.asarray(tape.quantities[p]).tolist()
+
+        orders = []
+        all_own_trades = []
+        positions = np.zeros((len(timestamps), len(products)), dtype=np.int64)
+        cash = np.zeros((len(timestamps), len(products)))
+        strategy_time = np.zeros(len(timestamps))
+        position: Dict[str, int] = {}
+        cash_now = np.zeros(len(products))
+        own_trades = {p: [] for p in products}
+        market_trades = {p: [] for p in products}
+        run = self.trader.run
+        log = self.log if self.log is not None else open(os.devnull, "w")
+        start = perf_counter()
+        with contextlib.redirect_stdout(log):
+            for t, state in enumerate(iter_states(book)):
+                timestamp = state.timestamp
+                state.own_trades = own_trades
+                state.market_trades = market_trades
+                state.position = dict(position)
+                # timestamp prefix as in the sandbox logs
+                print(timestamp, end=" ")
+                tick_start = perf_counter()
+                result = run(state)
+                strategy_time[t] = perf_counter() - tick_start
+                orders.append(result)
+
+                own_trades = {p: [] for p in products}
+                market_trades = {p: [] for p in products}
+                for p in traded:
+                    if p in bounds:
+                        lo, hi = bounds[p][0][t], bounds[p][1][t]
+                    else:
+                        lo = hi = 0
+                    product_orders = [o for o in result.get(p, []) if int(o.quantity) != 0]
+                    remaining = tape_quantities[p][lo:hi] if hi > lo else ()
+                    if product_orders:
+                        fills, remaining = match_orders(product_orders, levels[p][t],
+                                                        tape_prices[p][lo:hi] if hi > lo else (),
+                                                        remaining, position.get(p, 0), limits.get(p, 0))
+                        if fills:
+                            own_trades[p] = fills_to_trades(p, fills, timestamp)
+                            i = index[p]
+                            for price, quantity in fills:
+                                position[p] = position.get(p, 0) + quantity
+                                cash_now[i] -= price * quantity
+                    if hi > lo:
+                        market_trades[p] = [
+                            Trade(p, tape_prices[p][lo + k], remaining[k],
+                                  tape.buyers[p][lo + k], tape.sellers[p][lo + k], timestamp)
+                            for k in range(hi - lo) if remaining[k] > 0]
+                all_own_trades.append(own_trades)
+                for p, quantity in position.items():
+                    positions[t, index[p]] = quantity
+                cash[t] = cash_now
+        total_time = perf_counter() - start
+        if self.log is None:
+            log.close()
+        mids = np.column_stack([book.mid[p] for p in products])
+        pnl = cash + positions * mids
+        return BacktestResult(timestamps, products, orders, all_own_trades, positions, pnl,
+                              strategy_time, total_time)
+
+
+if __name__ == "__main__":
+    # python backtester.py algo_hedging_combined_2 2 0
+    module, round_no, day = sys.argv[1], sys.argv[2], sys.argv[3]
+    from data_cache import load_book, load_tape
+    book = load_book(price_file(round_no, day))
+    tape = load_tape(trades_file(round_no, day))
+    result = Backtester(load_trader(module), book, tape).run()
+    print(result.summary())
+    print(result.final_pnl())
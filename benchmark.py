@@ -0,0 +1,284 @@
+"""
+Per tick latency of every Trader in the repo over a recorded day
+Reports p50/p99/max of Trader.run and of each strategy block the trader times in block_times,
+the runs over a budgeted trader's time budget, the peak memory allocated per tick, and compares against a saved baseline
+    python benchmark.py                    # all algos on round 2 day 0
+    python benchmark.py --save algo_final  # record a new baseline for algo_final
+    python benchmark.py --datamodel        # size and construction time of the datamodel objects
+    python benchmark.py --codec            # TradingState codec against TradingState.toJSON, and delta recordings
+"""
+
+import os
+import sys
+import glob
+import json
+import argparse
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+
+from datamodel import Listing, Order, OrderDepth, Trade, TradingState, ProsperityEncoder
+from backtester import Backtester, OBSERVATION_PRODUCTS, load_trader, price_file, trades_file
+from data_cache import load_book, load_tape
+from streaming import stream_states
+from orderbook import SortedOrderDepth
+import codec
+import recording
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(ROOT, "benchmark_baseline.json")
+# a p99 this much slower than the baseline is flagged
+REGRESSION = 1.25
+
+
+def all_traders():
+    """module names of every top level algo"""
+    names = [os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(ROOT, "algo_*.py"))]
+    return sorted(names) + ["bot_test"]
+
+
+class _Probe:
+    """stands in for the trader in the Backtester, recording block times and allocations around run"""
+    def __init__(self, trader, allocations):
+        self.trader = trader
+        self.asset_dicts = getattr(trader, "asset_dicts", {})
+        self.allocations = allocations
+        self.blocks = {}
+        self.peaks = []
+
+    @property
+    def strategies(self):
+        """the trader's strategy registry, so the Backtester sets the budget of the trader rather than the probe"""
+        return getattr(self.trader, "strategies", None)
+
+    def run(self, state):
+        if self.allocations:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        result = self.trader.run(state)
+        if self.allocations:
+            self.peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        for block, seconds in getattr(self.trader, "block_times", {}).items():
+            self.blocks.setdefault(block, []).append(seconds)
+        return result
+
+
+def percentiles(seconds):
+    """p50, p99 and max in milliseconds"""
+    seconds = np.asarray(seconds) * 1e3
+    return {"p50": float(np.percentile(seconds, 50)), "p99": float(np.percentile(seconds, 99)),
+            "max": float(seconds.max())}
+
+
+def bench(module, book, tape):
+    """latency and allocation statistics of one trader over a day"""
+    # timing pass without tracemalloc, which slows every allocation
+    probe = _Probe(load_trader(module), allocations=False)
+    start = perf_counter()
+    # the budget stays on, the overruns are part of the report
+    result = Backtester(probe, book, tape, deterministic=False).run()
+    stats = {"run": percentiles(result.strategy_time),
+             "blocks": {b: percentiles(s) for b, s in probe.blocks.items()},
+             "wall": perf_counter() - start}
+    # runs over the time budget of a trader whose strategies are budgeted
+    registry = probe.strategies
+    if getattr(registry, "budget", None) is not None:
+        stats["overruns"] = registry.overrun_count
+    probe = _Probe(load_trader(module), allocations=True)
+    tracemalloc.start()
+    try:
+        Backtester(probe, book, tape).run()
+    finally:
+        tracemalloc.stop()
+    peaks = np.asarray(probe.peaks) / 1024
+    stats["alloc_kb"] = {"p50": float(np.percentile(peaks, 50)), "max": float(peaks.max())}
+    return stats
+
+
+def report(module, stats, baseline):
+    run = stats["run"]
+    line = (f"{module:28s} p50 {run['p50']:7.3f}ms  p99 {run['p99']:7.3f}ms  max {run['max']:7.3f}ms  "
+            f"alloc p50 {stats['alloc_kb']['p50']:7.1f}KB max {stats['alloc_kb']['max']:8.1f}KB")
+    if module in baseline:
+        ratio = run["p99"] / baseline[module]["run"]["p99"]
+        line += f"  p99 x{ratio:.2f} vs baseline" + ("  REGRESSION" if ratio > REGRESSION else "")
+    if "overruns" in stats:
+        line += f"  overruns {stats['overruns']}"
+    print(line)
+    for block, block_stats in stats["blocks"].items():
+        print(f"    {block:24s} p50 {block_stats['p50']:7.3f}ms  p99 {block_stats['p99']:7.3f}ms  "
+              f"max {block_stats['max']:7.3f}ms")
+
+
+class _DictOrder:
+    """Order as it was before __slots__, for comparison"""
+    def __init__(self, symbol, price, quantity):
+        self.symbol = symbol
+        self.price = price
+        self.quantity = quantity
+
+
+class _DictOrderDepth:
+    """OrderDepth as it was before __slots__, for comparison"""
+    def __init__(self):
+        self.buy_orders = {}
+        self.sell_orders = {}
+
+
+def _replay_objects(book, order_cls, depth_cls):
+    """the objects a replay of the day creates: an order depth and a two sided quote per product per tick"""
+    objects = []
+    for product in book.products:
+        if product in OBSERVATION_PRODUCTS:
+            continue
+        for row in book.levels[product].tolist():
+            if depth_cls is not None:
+                depth = depth_cls()
+                depth.buy_orders[row[0]] = row[1]
+                depth.sell_orders[row[6]] = -row[7]
+                objects.append(depth)
+            objects.append(order_cls(product, row[0] + 1, 5))
+            objects.append(order_cls(product, row[6] - 1, -5))
+    return objects
+
+
+def check_serialisation():
+    """the slotted classes must serialise exactly as the __dict__ ones did"""
+    depth = OrderDepth()
+    depth.buy_orders[9998] = 3
+    depth.sell_orders[10002] = -4
+    state = TradingState(100, {"PEARLS": Listing("PEARLS", "PEARLS", "SEASHELLS")}, {"PEARLS": depth},
+                         {"PEARLS": [Trade("PEARLS", 9999, 2, "SUBMISSION", "", 0)]}, {"PEARLS": []},
+                         {"PEARLS": 2}, {})
+    expected = {"listings": {"PEARLS": {"denomination": "SEASHELLS", "product": "PEARLS", "symbol": "PEARLS"}},
+                "market_trades": {"PEARLS": []}, "observations": {},
+                "order_depths": {"PEARLS": {"buy_orders": {"9998": 3}, "sell_orders": {"10002": -4}}},
+                "own_trades": {"PEARLS": [{"buyer": "SUBMISSION", "price": 9999, "quantity": 2, "seller": "",
+                                           "symbol": "PEARLS", "timestamp": 0}]},
+                "position": {"PEARLS": 2}, "timestamp": 100}
+    assert json.loads(state.toJSON()) == expected, state.toJSON()
+    orders = json.dumps([Order("PEARLS", 9999, 5)], cls=ProsperityEncoder)
+    assert json.loads(orders) == [{"symbol": "PEARLS", "price": 9999, "quantity": 5}], orders
+    # the replays hand traders SortedOrderDepth, whose own __slots__ are empty
+    state.order_depths = {"PEARLS": SortedOrderDepth({9998: 3}, {10002: -4})}
+    assert json.loads(state.toJSON()) == expected, state.toJSON()
+
+
+def bench_datamodel(book):
+    check_serialisation()
+    print("TradingState.toJSON and ProsperityEncoder output unchanged")
+    cases = (("orders __dict__", _DictOrder, None), ("orders __slots__", Order, None),
+             ("orders+depths __dict__", _DictOrder, _DictOrderDepth), ("orders+depths __slots__", Order, OrderDepth))
+    for label, order_cls, depth_cls in cases:
+        tracemalloc.start()
+        objects = _replay_objects(book, order_cls, depth_cls)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del objects
+        times = []
+        for _ in range(3):
+            start = perf_counter()
+            _replay_objects(book, order_cls, depth_cls)
+            times.append(perf_counter() - start)
+        print(f"{label:24s} {size / 2**20:6.1f}MB  build {min(times):.3f}s")
+
+
+def _best_time(f, items, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        for item in items:
+            f(item)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def bench_codec(prices, trades):
+    states = list(stream_states([prices], [trades] if trades else []))
+    for state in states:
+        assert codec.to_compact(codec.decode_json(codec.encode_json(state))) == codec.to_compact(state)
+        assert codec.to_compact(codec.decode_binary(codec.encode_binary(state))) == codec.to_compact(state)
+    print(f"{len(states)} states round trip through both layouts")
+    reflected = [s.toJSON() for s in states]
+    compact = [codec.encode_json(s) for s in states]
+    binary = [codec.encode_binary(s) for s in states]
+    base = _best_time(TradingState.toJSON, states)
+    rows = (("toJSON encode", base, reflected),
+            ("compact json encode", _best_time(codec.encode_json, states), compact),
+            ("binary encode", _best_time(codec.encode_binary, states), binary),
+            ("toJSON json.loads", _best_time(json.loads, reflected), reflected),
+            ("compact json decode", _best_time(codec.decode_json, compact), compact),
+            ("binary decode", _best_time(codec.decode_binary, binary), binary))
+    for label, seconds, records in rows:
+        size = sum(len(r) for r in records) / len(records)
+        print(f"{label:22s} {1e6 * seconds / len(states):7.1f}us/state  x{base / seconds:5.2f}  {size:7.0f}B/state")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.rec")
+        start = perf_counter()
+        recording.write_session(path, states)
+        written = perf_counter() - start
+        session = recording.Session(path)
+        target = states[len(states) * 2 // 3].timestamp
+        start = perf_counter()
+        next(session.seek(target))
+        seek = perf_counter() - start
+        start = perf_counter()
+        for _ in session:
+            pass
+        replay = perf_counter() - start
+        print(f"delta recording        {os.path.getsize(path) / len(states):7.0f}B/state  "
+              f"write {1e6 * written / len(states):.1f}us/state  replay {1e6 * replay / len(states):.1f}us/state  "
+              f"seek {1e3 * seek:.2f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", help="trader modules, default every algo_*.py and bot_test")
+    parser.add_argument("--round", type=int, default=2)
+    parser.add_argument("--day", type=int, default=0)
+    parser.add_argument("--prices", help="price file to replay instead of --round/--day")
+    parser.add_argument("--trades", help="trades file to replay with --prices")
+    parser.add_argument("--save", action="store_true", help="write the results into the baseline file")
+    parser.add_argument("--datamodel", action="store_true", help="benchmark the datamodel classes instead")
+    parser.add_argument("--codec", action="store_true", help="benchmark the TradingState codec instead")
+    args = parser.parse_args(argv)
+
+    if args.codec:
+        bench_codec(args.prices or price_file(args.round, args.day),
+                    args.trades if args.prices else trades_file(args.round, args.day))
+        return 0
+    book = load_book(args.prices or price_file(args.round, args.day))
+    if args.datamodel:
+        bench_datamodel(book)
+        return 0
+    trades = args.trades if args.prices else trades_file(args.round, args.day)
+    tape = load_tape(trades) if trades else None
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for module in args.modules or all_traders():
+        try:
+            results[module] = bench(module, book, tape)
+        except Exception as e:
+            # e.g. algo_final needs the round 3 and 4 products
+            print(f"{module:28s} failed: {type(e).__name__}: {e}")
+            continue
+        report(module, results[module], baseline)
+
+    if args.save:
+        baseline.update(results)
+        with open(BASELINE, "w") as f:
+            json.dump(baseline, f, indent=1)
+    regressions = [m for m in results if m in baseline and not args.save
+                   and results[m]["run"]["p99"] > REGRESSION * baseline[m]["run"]["p99"]]
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,79 +20,144 @@ class MyKalmanFilter:
         # measurement noise variance
         self.R = R
 
-        # co-variance of process noise(2 dimensions)
-        self.Q = delta / (1-delta) * np.eye(2)
+        # co-variance of process noise(2 dimensions), q on the diagonal
+        self.q = delta / (1-delta)
+        self.Q = self.q * np.eye(2)
 
-        # previous state
-        self.x = np.zeros((2, 1))
+        # previous state (slope, intercept), the symmetric state covariance and the last gain as scalars
+        self.x0 = self.x1 = 0.0
+        self.p00 = self.p01 = self.p11 = 0.0
+        self.k0 = self.k1 = 0.0
 
-        # state covariance
-        self.P = np.zeros((2,2))
+    @property
+    def x(self):
+        return np.array([[self.x0], [self.x1]])
 
-    def step_forward(self, y1, y2):
-        # Before entering the equations, let's define H as (1, 2) matrix
-        H = np.array([y2, 1])[None]
-        # and define z
-        z = y1
+    @property
+    def P(self):
+        return np.array([[self.p00, self.p01], [self.p01, self.p11]])
 
-        ## TIME UPDATE ##
-        # first thing is to predict new state as the previous one (2x1)
-        x_hat = self.x
+    @property
+    def K(self):
+        return np.array([[self.k0], [self.k1]])
 
-        # then, the uncertainty or covariance prediction
-        P_hat = self.P + self.Q
+    def step_forward(self, y1, y2):
+        """
+        one filter step in closed form for H = [y2, 1], returning the measurement estimate z_hat.
+        x, P and K are built as arrays only when read
+        """
+        ## TIME UPDATE ##
+        # the state prediction is the previous state, the covariance prediction P + Q
+        p00 = self.p00 + self.q
+        p01 = self.p01
+        p11 = self.p11 + self.q
 
         ## MEASUREMENT UPDATE ##
-        # calc the Kalman gain
-        K = P_hat.dot(H.T)/(H.dot(P_hat.dot(H.T))+self.R)
-
-        # state update part 1 (measurement estimation)
-        z_hat = H.dot(x_hat)
-
-        # state update part 2
-        x = x_hat + K.dot(z-z_hat)
-
-        # uncertainty update
-        self.P = (np.eye(2)-K.dot(H)).dot(P_hat)
-
-        # refresh the previous state
-        self.x = x
-
-        return x, self.P, K, z_hat
+        # P_hat H' and the Kalman gain
+        ph0 = p00*y2 + p01
+        ph1 = p01*y2 + p11
+        s = y2*ph0 + ph1 + self.R
+        self.k0 = k0 = ph0/s
+        self.k1 = k1 = ph1/s
+
+        # measurement estimation and state update
+        z_hat = self.x0*y2 + self.x1
+        error = y1 - z_hat
+        self.x0 += k0*error
+        self.x1 += k1*error
+
+        # P = (I - K H) P_hat
+        self.p00 = p00 - k0*ph0
+        self.p01 = p01 - k0*ph1
+        self.p11 = p11 - k1*ph1
+        return z_hat
+
+class History:
+    """
+    the capacity most recent values in a ring buffer, with a running mean and variance.
+    every value is written twice, capacity apart, so the window is always one contiguous slice
+    and values() and last(k) are views rather than copies
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = np.zeros(2*capacity)
+        self.end = capacity
+        self.count = 0
+        self.running_mean = 0.0
+        self.m2 = 0.0
+    def append(self, value):
+        """add a value, dropping the oldest once full, in O(1)"""
+        capacity = self.capacity
+        if self.end == 2*capacity:
+            self.end = capacity
+        oldest = self.buffer[self.end - capacity]
+        self.buffer[self.end - capacity] = value
+        self.buffer[self.end] = value
+        self.end += 1
+        if self.count < capacity:
+            # welford
+            self.count += 1
+            delta = value - self.running_mean
+            self.running_mean += delta/self.count
+            self.m2 += delta*(value - self.running_mean)
+        else:
+            # sliding welford: value replaces oldest
+            mean = self.running_mean + (value - oldest)/capacity
+            self.m2 += (value - oldest)*(value - mean + oldest - self.running_mean)
+            self.running_mean = mean
+            if self.end == 2*capacity:
+                # resync once per lap so rounding cannot build up
+                window = self.values()
+                self.running_mean = float(window.mean())
+                self.m2 = float(((window - self.running_mean)**2).sum())
+    def __len__(self):
+        return self.count
+    def values(self):
+        """the window oldest first, a view"""
+        return self.buffer[self.end - self.count:self.end]
+    def last(self, k):
+        """the k most recent values oldest first, a view"""
+        return self.buffer[self.end - min(k, self.count):self.end]
+    def __getitem__(self, key):
+        return self.values()[key]
+    @property
+    def mean(self):
+        return self.running_mean
+    @property
+    def std(self):
+        """population standard deviation, as np.std"""
+        return np.sqrt(max(self.m2, 0.0)/self.count) if self.count else np.nan
+    def zscore(self, value):
+        return (value - self.running_mean)/self.std
 
 # asset class: stores info about an asset not in the datamodel
 class Asset:
     """asset class to contain previous prices, and the limits for an asset"""
     def __init__(self, limit, period, fast_period):
         self.limit = limit
-        self.ask_prices = []
-        self.bid_prices = []
-        self.residual = []
         self.last_mid = None
         self.period = period
         self.fast_period = fast_period
+    @property
+    def period(self):
+        return self._period
+    @period.setter
+    def period(self, period):
+        """a new period starts the histories afresh"""
+        self._period = period
+        self.ask_prices = History(period)
+        self.bid_prices = History(period)
+        self.residual = History(period)
     def update_ask_prices(self, ask_price):
         """update the period most recent ask prices"""
-        if len(self.ask_prices)<self.period:
-            self.ask_prices.append(ask_price)
-        else:
-            self.ask_prices.pop(0)
-            self.ask_prices.append(ask_price)
+        self.ask_prices.append(ask_price)
     def update_bid_prices(self, bid_price):
         """update the period most recent bid prices"""
-        if len(self.bid_prices)<self.period:
-            self.bid_prices.append(bid_price)
-        else:
-            self.bid_prices.pop(0)
-            self.bid_prices.append(bid_price)
+        self.bid_prices.append(bid_price)
 
     def update_residual(self, res):
         """update the most recent residuals"""
-        if len(self.residual)<self.period:
-            self.residual.append(res)
-        else:
-            self.residual.pop(0)
-            self.residual.append(res)
+        self.residual.append(res)
 
 
 
@@ -0,0 +1,225 @@
+"""
+Explicit-schema codec for TradingState, replacing the reflection in TradingState.toJSON
+Two layouts of the same schema, both round trip through decode:
+    compact json: [timestamp, listings, order_depths, own_trades, market_trades, position, observations]
+        listings      [[symbol, product, denomination], ...]
+        order_depths  {symbol: [bid prices, bid volumes, ask prices, ask volumes]}, levels in book order
+        *_trades      {symbol: [price, quantity, buyer, seller, timestamp, price, ...]}, flattened
+        position      {product: position}, observations {product: value}
+    binary: a header, a table of the strings used separated by NUL, then every integer of the schema in the order
+        above as one int32 array (names and symbols as string indices, -1 for None, book levels as price, volume
+        pairs) and the observations as float64
+"""
+
+import json
+import struct
+from array import array
+from itertools import chain, islice
+from typing import Iterable, Iterator
+
+from datamodel import Listing, Trade, TradingState
+from orderbook import AskSide, BidSide, SortedOrderDepth
+
+MAGIC = b"TS"
+VERSION = 2
+
+# magic, version, timestamp, bytes of the string table, number of ints, number of observations
+_HEADER = struct.Struct("<2sBqIIH")
+_LENGTH = struct.Struct("<I")
+_ENCODER = json.JSONEncoder(separators=(",", ":"), check_circular=False)
+# the scanner under json.loads, without its whitespace checks
+_SCAN = json.JSONDecoder().scan_once
+
+# listings hardly change from tick to tick, so their encoding is kept between calls:
+# [(symbol, product, denomination) of every listing, json fragment, binary string table, binary ints]
+_listings_cache = [None, None, None, None]
+# and so is the last decoded listings dict: [[[symbol, product, denomination], ...], listings]
+_decoded_listings = [None, None]
+
+
+def _levels(order_depth):
+    buy_orders, sell_orders = order_depth.buy_orders, order_depth.sell_orders
+    # dict.keys rather than .keys(), which a SortedOrderDepth side answers by sorting
+    return [list(dict.keys(buy_orders)), list(dict.values(buy_orders)),
+            list(dict.keys(sell_orders)), list(dict.values(sell_orders))]
+
+
+def _flat_trades(trades_by_symbol):
+    return {s: [x for t in trades for x in (t.price, t.quantity, t.buyer, t.seller, t.timestamp)]
+            for s, trades in trades_by_symbol.items()}
+
+
+def _trades(symbol, flat):
+    # five at a time off one iterator: price, quantity, buyer, seller, timestamp
+    fields = iter(flat)
+    return [Trade(symbol, price, quantity, buyer, seller, timestamp)
+            for price, quantity, buyer, seller, timestamp in zip(fields, fields, fields, fields, fields)]
+
+
+def _cached_listings(listings):
+    cache = _listings_cache
+    key = [(l.symbol, l.product, l.denomination) for l in listings.values()]
+    if cache[0] != key:
+        strings = {None: -1}
+        intern = lambda name: strings.setdefault(name, len(strings) - 1)
+        ints = [len(key)]
+        for listing in key:
+            ints += map(intern, listing)
+        cache[:] = key, _ENCODER.encode(key), strings, ints
+    return cache
+
+
+def _listings(rows):
+    """the listings dict of [[symbol, product, denomination], ...], shared with the last call if they are equal"""
+    cache = _decoded_listings
+    if cache[0] != rows:
+        cache[:] = rows, {l[0]: Listing(*l) for l in rows}
+    return cache[1]
+
+
+def to_compact(state: TradingState):
+    """the state as nested lists and dicts of the compact layout"""
+    return [state.timestamp,
+            [[l.symbol, l.product, l.denomination] for l in state.listings.values()],
+            {s: _levels(d) for s, d in state.order_depths.items()},
+            _flat_trades(state.own_trades),
+            _flat_trades(state.market_trades),
+            state.position,
+            state.observations]
+
+
+def from_compact(data) -> TradingState:
+    timestamp, listings, order_depths, own_trades, market_trades, position, observations = data
+    depths = {}
+    for symbol, (bid_prices, bid_volumes, ask_prices, ask_volumes) in order_depths.items():
+        # the sides are set directly, skipping the constructor
+        order_depth = depths[symbol] = object.__new__(SortedOrderDepth)
+        order_depth.buy_orders = BidSide(zip(bid_prices, bid_volumes))
+        order_depth.sell_orders = AskSide(zip(ask_prices, ask_volumes))
+    return TradingState(
+        timestamp,
+        _listings(listings),
+        depths,
+        {s: _trades(s, flat) if flat else [] for s, flat in own_trades.items()},
+        {s: _trades(s, flat) if flat else [] for s, flat in market_trades.items()},
+        position,
+        observations)
+
+
+def encode_json(state: TradingState) -> str:
+    # the listings fragment is spliced in rather than encoded again
+    rest = _ENCODER.encode([{s: _levels(d) for s, d in state.order_depths.items()},
+                            _flat_trades(state.own_trades),
+                            _flat_trades(state.market_trades),
+                            state.position,
+                            state.observations])
+    return f"[{int(state.timestamp)},{_cached_listings(state.listings)[1]},{rest[1:]}"
+
+
+def decode_json(text) -> TradingState:
+    return from_compact(_SCAN(text, 0)[0])
+
+
+def encode_binary(state: TradingState) -> bytes:
+    _, _, listing_strings, listing_ints = _cached_listings(state.listings)
+    strings = dict(listing_strings)
+    # setdefault hands out the next index the first time a name is seen
+    intern = lambda name: strings.setdefault(name, len(strings) - 1)
+
+    ints = list(listing_ints)
+    ints.append(len(state.order_depths))
+    for symbol, order_depth in state.order_depths.items():
+        buy_orders, sell_orders = order_depth.buy_orders, order_depth.sell_orders
+        ints += (intern(symbol), len(buy_orders), len(sell_orders))
+        ints += chain.from_iterable(dict.items(buy_orders))
+        ints += chain.from_iterable(dict.items(sell_orders))
+    for trades_by_symbol in (state.own_trades, state.market_trades):
+        ints.append(len(trades_by_symbol))
+        for symbol, trades in trades_by_symbol.items():
+            ints += (intern(symbol), len(trades))
+            for t in trades:
+                ints += (t.price, t.quantity, intern(t.buyer), intern(t.seller), t.timestamp)
+    ints.append(len(state.position))
+    for product, position in state.position.items():
+        ints += (intern(product), position)
+    ints.append(len(state.observations))
+    ints += map(intern, state.observations)
+
+    del strings[None]
+    table = "\0".join(strings).encode()
+    header = _HEADER.pack(MAGIC, VERSION, state.timestamp, len(table), len(ints), len(state.observations))
+    return b"".join((header, table, array("i", ints).tobytes(),
+                     array("d", state.observations.values()).tobytes()))
+
+
+def decode_binary(data) -> TradingState:
+    view = memoryview(data)
+    magic, version, timestamp, table_size, n_ints, n_observations = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} TradingState record")
+    offset = _HEADER.size + table_size
+    strings = str(view[_HEADER.size:offset], "utf-8").split("\0") if table_size else []
+    # index -1 reads the trailing None
+    strings.append(None)
+    ints = array("i")
+    ints.frombytes(view[offset:offset + 4 * n_ints])
+    offset += 4 * n_ints
+    values = array("d")
+    values.frombytes(view[offset:offset + 8 * n_observations])
+
+    # every count is followed by what it counts, so the ints are read off one iterator in schema order
+    ints = iter(ints.tolist())
+    listings = _listings([[strings[s], strings[p], strings[d]] for _, s, p, d in zip(range(next(ints)), ints, ints, ints)])
+    order_depths = {}
+    for _ in range(next(ints)):
+        symbol, n_bids, n_asks = next(ints), next(ints), next(ints)
+        order_depth = order_depths[strings[symbol]] = object.__new__(SortedOrderDepth)
+        # zip takes the price off islice before the volume, so it stops after the last pair
+        order_depth.buy_orders = BidSide(zip(islice(ints, n_bids), ints))
+        order_depth.sell_orders = AskSide(zip(islice(ints, n_asks), ints))
+    trade_sections = []
+    for _ in range(2):
+        trades_by_symbol = {}
+        for _ in range(next(ints)):
+            symbol, n_trades = strings[next(ints)], next(ints)
+            trades_by_symbol[symbol] = [Trade(symbol, price, quantity, strings[buyer], strings[seller], timestamp)
+                                        for _, price, quantity, buyer, seller, timestamp
+                                        in zip(range(n_trades), ints, ints, ints, ints, ints)] if n_trades else []
+        trade_sections.append(trades_by_symbol)
+    position = {strings[p]: v for _, p, v in zip(range(next(ints)), ints, ints)}
+    observations = {strings[p]: v for p, v in zip(islice(ints, next(ints)), values.tolist())}
+    return TradingState(timestamp, listings, order_depths, trade_sections[0], trade_sections[1],
+                        position, observations)
+
+
+def write_states(path, states: Iterable[TradingState], binary=True):
+    """record states to a file: length prefixed binary records, or one compact json line each"""
+    if binary:
+        with open(path, "wb") as f:
+            for state in states:
+                record = encode_binary(state)
+                f.write(_LENGTH.pack(len(record)))
+                f.write(record)
+    else:
+        with open(path, "w") as f:
+            for state in states:
+                f.write(encode_json(state))
+                f.write("\n")
+
+
+def read_states(path, binary=True) -> Iterator[TradingState]:
+    """replay states recorded by write_states"""
+    if binary:
+        with open(path, "rb") as f:
+            data = f.read()
+        view = memoryview(data)
+        offset = 0
+        while offset < len(data):
+            (length,) = _LENGTH.unpack_from(view, offset)
+            offset += _LENGTH.size
+            yield decode_binary(view[offset:offset + length])
+            offset += length
+    else:
+        with open(path) as f:
+            for line in f:
+                yield decode_json(line)
@@ -0,0 +1,156 @@
+"""
+Counterparty flow index over the named market trades of TradesData/island-data-bottle-round-5/*_wn.csv
+Every trade is two rows, the buyer's with +quantity and the seller's with -quantity, and wash trades, buyer and
+seller the same bot, are dropped. The rows of all days are sorted once by (trader, product, clock) with running
+sums kept alongside, so each (trader, product) is a contiguous run and any time range of it is two binary searches
+and a difference of sums:
+    net       signed quantity traded, + bought
+    volume    quantity traded either way, vwap the volume weighted price
+    drift     volume weighted move of the mid horizon timestamps after the trade, signed by the trader's side,
+              so a trader whose buys come before the mid rises has positive drift. only days with a price file count
+clock orders the days: clock_of(round, day, timestamp) = day number * DAY_LENGTH + timestamp, days numbered in
+(round, day) order of the days indexed
+"""
+
+import os
+import re
+import sys
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+import numpy as np
+
+from backtester import TRADES_DIR, price_file, trades_file
+from data_cache import load_book, load_codes
+
+# timestamps of a day run below this
+DAY_LENGTH = 1_000_000
+NAMED_TRADES = re.compile(r"trades_round_(-?\d+)_day_(-?\d+)_wn\.csv$")
+
+
+class Flow(NamedTuple):
+    trades: int
+    net: int
+    volume: int
+    vwap: float
+    drift: float
+
+
+def named_days():
+    """(round, day) of every named trades file, in order"""
+    folder = os.path.join(TRADES_DIR, "island-data-bottle-round-5")
+    return sorted((int(m.group(1)), int(m.group(2))) for m in map(NAMED_TRADES.match, os.listdir(folder)) if m)
+
+
+def _mid_move(round_no, day, columns, horizon):
+    """{product: move of the mid from each trade to horizon later}, NaN past the end or without a price file"""
+    path = price_file(round_no, day)
+    moves = {}
+    book = load_book(path) if os.path.exists(path) else None
+    for product, c in columns.items():
+        move = np.full(len(c["timestamp"]), np.nan)
+        if book is not None and product in book.mid:
+            timestamps = np.asarray(book.timestamps)
+            mid = np.asarray(book.mid[product])
+            now = np.searchsorted(timestamps, c["timestamp"], side="right") - 1
+            later = np.searchsorted(timestamps, np.asarray(c["timestamp"]) + horizon, side="right") - 1
+            known = (now >= 0) & (np.asarray(c["timestamp"]) + horizon <= timestamps[-1])
+            move[known] = mid[later[known]] - mid[now[known]]
+        moves[product] = move
+    return moves
+
+
+class FlowIndex:
+    """
+    the flow of every trader in every product over days, a list of (round, day), all named days by default.
+    horizon is in timestamps, 1000 being ten ticks
+    """
+    def __init__(self, days: Iterable[Tuple[int, int]] = None, horizon=1000):
+        self.days = list(days) if days is not None else named_days()
+        self.horizon = horizon
+        self.day_number = {d: i for i, d in enumerate(self.days)}
+        names, products = {}, {}
+        parts = []
+        for number, (round_no, day) in enumerate(self.days):
+            columns, file_names = load_codes(trades_file(round_no, day, names=True))
+            # file codes -> index codes; the trailing entry takes code -1
+            lookup = np.array([names.setdefault(n, len(names)) for n in file_names] + [-1], dtype=np.int32)
+            moves = _mid_move(round_no, day, columns, horizon)
+            for product, c in columns.items():
+                code = products.setdefault(product, len(products))
+                # a bot trading with itself shows no direction, so wash trades are left out
+                kept = np.asarray(c["buyer"]) != np.asarray(c["seller"])
+                n = int(kept.sum())
+                clock = number * DAY_LENGTH + np.asarray(c["timestamp"], dtype=np.int64)[kept]
+                quantity = np.asarray(c["quantity"], dtype=np.int64)[kept]
+                price = np.asarray(c["price"], dtype=np.float64)[kept]
+                for side, sign in (("buyer", 1), ("seller", -1)):
+                    parts.append((lookup[np.asarray(c[side])[kept]], np.full(n, code, dtype=np.int32), clock,
+                                  sign * quantity, price, sign * moves[product][kept]))
+        self.names = list(names)
+        self.products = list(products)
+        self.trader_code = names
+        self.product_code = products
+        trader, product, clock, signed, price, drift = (np.concatenate(column) for column in zip(*parts)) \
+            if parts else (np.empty(0, dtype=t) for t in (np.int32, np.int32, np.int64, np.int64, float, float))
+        named = trader >= 0
+        trader, product, clock, signed, price, drift = (a[named] for a in (trader, product, clock, signed, price, drift))
+        order = np.lexsort((clock, product, trader))
+        self.trader, self.product, self.clock = trader[order], product[order], clock[order]
+        signed, price, drift = signed[order], price[order], drift[order]
+        volume = np.abs(signed)
+        known = np.isfinite(drift)
+
+        def running(values):
+            return np.concatenate([[0], np.cumsum(values)])
+        self.sum_net = running(signed)
+        self.sum_volume = running(volume)
+        self.sum_notional = running(price * volume)
+        self.sum_drift = running(np.where(known, drift, 0) * volume)
+        self.sum_drift_volume = running(np.where(known, volume, 0))
+        # (trader code, product code) -> [start, end) of its run
+        starts = np.flatnonzero(np.concatenate([[True], (np.diff(self.trader) != 0) | (np.diff(self.product) != 0)]))
+        ends = np.append(starts[1:], len(self.trader))
+        self.runs = {(int(self.trader[s]), int(self.product[s])): (int(s), int(e)) for s, e in zip(starts, ends)}
+
+    def clock_of(self, round_no, day, timestamp=0):
+        """the clock of a timestamp of an indexed day"""
+        return self.day_number[(round_no, day)] * DAY_LENGTH + timestamp
+
+    def flow(self, trader, product, start=None, end=None) -> Flow:
+        """flow of trader in product over clocks [start, end), the whole index by default"""
+        run = self.runs.get((self.trader_code.get(trader, -1), self.product_code.get(product, -1)))
+        if run is None:
+            return Flow(0, 0, 0, np.nan, np.nan)
+        lo, hi = run
+        clock = self.clock[lo:hi]
+        if start is not None:
+            lo += int(np.searchsorted(clock, start, side="left"))
+        if end is not None:
+            hi = run[0] + int(np.searchsorted(clock, end, side="left"))
+        hi = max(hi, lo)
+        volume = self.sum_volume[hi] - self.sum_volume[lo]
+        drift_volume = self.sum_drift_volume[hi] - self.sum_drift_volume[lo]
+        return Flow(hi - lo,
+                    int(self.sum_net[hi] - self.sum_net[lo]),
+                    int(volume),
+                    float(self.sum_notional[hi] - self.sum_notional[lo]) / volume if volume else np.nan,
+                    float(self.sum_drift[hi] - self.sum_drift[lo]) / drift_volume if drift_volume else np.nan)
+
+    def table(self, min_volume=0) -> Dict[Tuple[str, str], Flow]:
+        """{(trader, product): Flow} over the whole index, of the pairs that traded at least min_volume"""
+        flows = {}
+        for (t, p) in self.runs:
+            flow = self.flow(self.names[t], self.products[p])
+            if flow.volume >= min_volume:
+                flows[(self.names[t], self.products[p])] = flow
+        return flows
+
+
+if __name__ == "__main__":
+    index = FlowIndex(horizon=int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
+    flows = index.table(min_volume=50)
+    print(f"{len(index.days)} days, {len(index.names)} traders, {len(index.clock)} trader rows")
+    # the traders whose flow the mid follows most, the candidates to copy
+    for (trader, product), flow in sorted(flows.items(), key=lambda f: -np.nan_to_num(f[1].drift, nan=-np.inf))[:15]:
+        print(f"{trader:>9} {product:>13} trades {flow.trades:5d} net {flow.net:6d} volume {flow.volume:6d} "
+              f"vwap {flow.vwap:9.2f} drift {flow.drift:+.3f}")
@@ -0,0 +1,131 @@
+"""
+One-time conversion of the price and trade csvs into .npy columns that load memory-mapped
+Layout, next to the csv: .cache/<csv name>/ holding meta.json and one .npy per column
+    prices: timestamps.npy (T,) int32, <product>.npy (T, 12) int32 levels, <product>_mid.npy (T,) float64
+    trades: <product>_timestamp.npy, <product>_price.npy, <product>_quantity.npy int32,
+            <product>_buyer.npy, <product>_seller.npy int16 codes into meta names (-1 for no name)
+"""
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from backtester import PriceBook, DATA_DIR, TRADES_DIR
+from matching import TradeTape
+
+CACHE_VERSION = 1
+
+
+def cache_dir(csv_path):
+    """directory the columns of a csv are cached in"""
+    folder, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(folder, ".cache", os.path.splitext(name)[0])
+
+
+def is_fresh(csv_path):
+    """true if the cache exists, is the current version and is newer than the csv"""
+    meta_path = os.path.join(cache_dir(csv_path), "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return meta.get("version") == CACHE_VERSION and meta.get("mtime") == os.path.getmtime(csv_path)
+
+
+def _write_meta(directory, csv_path, **fields):
+    meta = {"version": CACHE_VERSION, "mtime": os.path.getmtime(csv_path), **fields}
+    # written last, so a half written cache is never fresh
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+def convert_prices(csv_path):
+    """write the columns of a price file"""
+    directory = cache_dir(csv_path)
+    os.makedirs(directory, exist_ok=True)
+    book = PriceBook.from_csv(csv_path)
+    np.save(os.path.join(directory, "timestamps.npy"), book.timestamps.astype(np.int32))
+    for product in book.products:
+        np.save(os.path.join(directory, f"{product}.npy"), np.ascontiguousarray(book.levels[product], dtype=np.int32))
+        np.save(os.path.join(directory, f"{product}_mid.npy"), book.mid[product])
+    _write_meta(directory, csv_path, kind="prices", day=book.day, products=book.products)
+
+
+def convert_trades(csv_path):
+    """write the columns of a trades file, names as int16 codes"""
+    directory = cache_dir(csv_path)
+    os.makedirs(directory, exist_ok=True)
+    df = pd.read_csv(csv_path, sep=";")
+    names = sorted(set(df["buyer"].dropna()) | set(df["seller"].dropna()))
+    codes = {name: i for i, name in enumerate(names)}
+    tape = TradeTape.from_frame(df)
+    for product in tape.products:
+        np.save(os.path.join(directory, f"{product}_timestamp.npy"), tape.timestamps[product].astype(np.int32))
+        np.save(os.path.join(directory, f"{product}_price.npy"), tape.prices[product])
+        np.save(os.path.join(directory, f"{product}_quantity.npy"), tape.quantities[product])
+        for side, values in (("buyer", tape.buyers[product]), ("seller", tape.sellers[product])):
+            np.save(os.path.join(directory, f"{product}_{side}.npy"),
+                    np.array([codes.get(v, -1) for v in values], dtype=np.int16))
+    _write_meta(directory, csv_path, kind="trades", products=tape.products, names=names)
+
+
+def _load(directory, name):
+    return np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+
+
+def load_book(csv_path) -> PriceBook:
+    """PriceBook of a price file whose arrays are read-only memory maps of the cache, converting first if needed"""
+    if not is_fresh(csv_path):
+        convert_prices(csv_path)
+    directory = cache_dir(csv_path)
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    products = meta["products"]
+    levels = {p: _load(directory, p) for p in products}
+    mid = {p: _load(directory, p + "_mid") for p in products}
+    return PriceBook(meta["day"], _load(directory, "timestamps"), products, levels, mid)
+
+
+def load_codes(csv_path):
+    """
+    the raw cached columns of a trades file without decoding names:
+    {product: {column: memory map}} and the list of names the codes index
+    """
+    if not is_fresh(csv_path):
+        convert_trades(csv_path)
+    directory = cache_dir(csv_path)
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    columns = {p: {c: _load(directory, f"{p}_{c}") for c in ("timestamp", "price", "quantity", "buyer", "seller")}
+               for p in meta["products"]}
+    return columns, meta["names"]
+
+
+def load_tape(csv_path) -> TradeTape:
+    """TradeTape of a trades file; numeric columns are memory maps, names are decoded to object arrays"""
+    columns, names = load_codes(csv_path)
+    # trailing None so code -1 decodes to no name
+    lookup = np.array(names + [None], dtype=object)
+    return TradeTape({p: c["timestamp"] for p, c in columns.items()},
+                     {p: c["price"] for p, c in columns.items()},
+                     {p: c["quantity"] for p, c in columns.items()},
+                     {p: lookup[c["buyer"]] for p, c in columns.items()},
+                     {p: lookup[c["seller"]] for p, c in columns.items()})
+
+
+def convert_all():
+    """convert every price and trade csv in Data/ and TradesData/"""
+    for folder, convert in ((DATA_DIR, convert_prices), (TRADES_DIR, convert_trades),
+                            (os.path.join(TRADES_DIR, "island-data-bottle-round-5"), convert_trades)):
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".csv"):
+                path = os.path.join(folder, name)
+                if not is_fresh(path):
+                    convert(path)
+                    print("cached", path)
+
+
+if __name__ == "__main__":
+    convert_all()
@@ -10,7 +10,25 @@ UserId = str
 Observation = int
 
 
+# type -> slot names of the type and every base, in base first order
+_slot_names = {}
+
+
+def _fields(o):
+    """attributes of a datamodel object, from the __slots__ of its class and bases where it has no __dict__"""
+    try:
+        return o.__dict__
+    except AttributeError:
+        names = _slot_names.get(type(o))
+        if names is None:
+            names = _slot_names[type(o)] = [name for cls in reversed(type(o).__mro__)
+                                            for name in cls.__dict__.get("__slots__", ())]
+        return {name: getattr(o, name) for name in names}
+
+
 class Listing:
+    __slots__ = ("symbol", "product", "denomination")
+
     def __init__(self, symbol: Symbol, product: Product, denomination: Product):
         self.symbol = symbol
         self.product = product
@@ -18,6 +36,8 @@ class Listing:
 
 
 class Order:
+    __slots__ = ("symbol", "price", "quantity")
+
     def __init__(self, symbol: Symbol, price: int, quantity: int) -> None:
         self.symbol = symbol
         self.price = price
@@ -31,12 +51,16 @@ class Order:
 
 
 class OrderDepth:
+    __slots__ = ("buy_orders", "sell_orders")
+
     def __init__(self):
         self.buy_orders: Dict[int, int] = {}
         self.sell_orders: Dict[int, int] = {}
 
 
 class Trade:
+    __slots__ = ("symbol", "price", "quantity", "buyer", "seller", "timestamp")
+
     def __init__(self, symbol: Symbol, price: int, quantity: int, buyer: UserId = None, seller: UserId = None, timestamp: int = 0) -> None:
         self.symbol = symbol
         self.price: int = price
@@ -63,8 +87,8 @@ class TradingState(object):
         self.observations = observations
 
     def toJSON(self):
-        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True)
+        return json.dumps(self, default=_fields, sort_keys=True)
 
 class ProsperityEncoder(JSONEncoder):
     def default(self, o):
-        return o.__dict__
+        return _fields(o)
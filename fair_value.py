@@ -0,0 +1,92 @@
+"""
+Order book fair values over whole days at once, in place of orderbook_fv and orderbook_vol_fv of FV_models.ipynb
+Both take book levels as a (T, 12) array in LEVEL_COLUMNS order, the PriceBook layout where a missing level has
+price 0, or straight from a price file frame where it is NaN. Each side is a weighted mean of its present levels,
+the fair value is the mean of the two sides:
+    level_fv    weights (a, b, c) on the first, second and third level
+    volume_fv   weights (a/volume, b/volume, c/volume), so a thin level counts for more
+a missing level drops out of both sums, and a side with no level at all gives NaN.
+weights can be a single (a, b, c) giving (T,) values, or a (K, 3) batch giving (K, T) in one call
+"""
+
+import sys
+import itertools
+from typing import Sequence
+
+import numpy as np
+
+from backtester import LEVEL_COLUMNS, price_file
+from data_cache import load_book
+
+_BID_PRICES, _BID_VOLUMES = [0, 2, 4], [1, 3, 5]
+_ASK_PRICES, _ASK_VOLUMES = [6, 8, 10], [7, 9, 11]
+
+
+def frame_levels(frame):
+    """(T, 12) float levels of a price file frame of one product, NaN for missing levels"""
+    return frame[LEVEL_COLUMNS].to_numpy(dtype=np.float64)
+
+
+def weight_grid(a_values: Sequence[float], b_values: Sequence[float], c_values: Sequence[float]):
+    """every (a, b, c) as a (K, 3) array, c varying fastest"""
+    return np.array(list(itertools.product(a_values, b_values, c_values)), dtype=np.float64)
+
+
+def _side(levels, prices, volumes, weights, by_volume):
+    """numerator and denominator of one side's weighted mean, (T, K)"""
+    p = levels[:, prices].astype(np.float64)
+    present = np.isfinite(p) & (p != 0)
+    scale = present.astype(np.float64)
+    if by_volume:
+        v = np.abs(levels[:, volumes].astype(np.float64))
+        present &= v > 0
+        scale = np.divide(1.0, v, out=np.zeros_like(v), where=present)
+    p = np.where(present, p, 0.0)
+    return (p * scale) @ weights.T, scale @ weights.T
+
+
+def _fair_value(levels, weights, by_volume):
+    levels = np.asarray(levels)
+    weights = np.asarray(weights, dtype=np.float64)
+    single = weights.ndim == 1
+    weights = np.atleast_2d(weights)
+    bid_sum, bid_weight = _side(levels, _BID_PRICES, _BID_VOLUMES, weights, by_volume)
+    ask_sum, ask_weight = _side(levels, _ASK_PRICES, _ASK_VOLUMES, weights, by_volume)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fv = ((bid_sum / bid_weight + ask_sum / ask_weight) / 2).T
+    return fv[0] if single else fv
+
+
+def level_fv(levels, weights):
+    """mean of the (a, b, c) level weighted bid and ask, (T,) for one weighting or (K, T) for a batch"""
+    return _fair_value(levels, weights, by_volume=False)
+
+
+def volume_fv(levels, weights):
+    """mean of the (a, b, c) over volume weighted bid and ask, (T,) for one weighting or (K, T) for a batch"""
+    return _fair_value(levels, weights, by_volume=True)
+
+
+def forecast_error(fv, mid, horizon=1):
+    """
+    root mean squared error of fair values (T,) or (K, T) as a forecast of the mid price horizon ticks on,
+    over the ticks where both are known. (K,) for a batch
+    """
+    fv = np.asarray(fv, dtype=np.float64)
+    mid = np.asarray(mid, dtype=np.float64)
+    error = mid[horizon:] - fv[..., :len(mid) - horizon]
+    with np.errstate(invalid="ignore"):
+        return np.sqrt(np.nanmean(error ** 2, axis=-1))
+
+
+if __name__ == "__main__":
+    round_no, day, product = 2, 0, "BANANAS"
+    if len(sys.argv) > 3:
+        round_no, day, product = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3]
+    book = load_book(price_file(round_no, day))
+    grid = weight_grid([1.0], np.linspace(0, 2, 21), np.linspace(0, 2, 21))
+    for name, model in (("level", level_fv), ("volume", volume_fv)):
+        error = forecast_error(model(book.levels[product], grid), book.mid[product])
+        a, b, c = grid[np.nanargmin(error)]
+        print(f"{name} fv {product}: {len(grid)} weightings, best (a, b, c) = ({a:g}, {b:g}, {c:g}) "
+              f"rmse {np.nanmin(error):.4f}, mid rmse {forecast_error(book.mid[product], book.mid[product]):.4f}")
@@ -0,0 +1,174 @@
+"""
+Offline Kalman filter and Rauch-Tung-Striebel smoother for the COCONUTS/PINA_COLADAS hedge regression
+Runs the model of MyKalmanFilter over whole days of prices for a grid of (delta, R) candidates at once:
+the time loop stays in python, but every step updates all G candidates together on a stacked (G, n, n)
+covariance, so a grid of hundreds of settings costs little more than one
+    z_t = H_t x_t + v_t,  v_t ~ N(0, R)        x_t = x_t-1 + w_t,  w_t ~ N(0, delta/(1-delta) I)
+with H_t = [y2_t, 1] as in bot_test, or the last mem y2 as in algo_hedging_kalman. x and P start at zero as there
+"""
+
+import sys
+import itertools
+from typing import Sequence
+
+import numpy as np
+
+from backtester import price_file
+from data_cache import load_book
+
+
+def pair_mids(round_no, day, y1_product="PINA_COLADAS", y2_product="COCONUTS"):
+    """(y1, y2) mid price arrays of a day, NaN where a book side was missing"""
+    book = load_book(price_file(round_no, day))
+    return np.asarray(book.mid[y1_product], dtype=float), np.asarray(book.mid[y2_product], dtype=float)
+
+
+def design(y2, mem=None):
+    """
+    (T, n) observation rows H_t: [y2_t, 1] if mem is None, else the last mem y2 oldest first,
+    zero before the start as in algo_hedging_kalman
+    """
+    y2 = np.asarray(y2, dtype=float)
+    if mem is None:
+        return np.column_stack([y2, np.ones_like(y2)])
+    padded = np.concatenate([np.zeros(mem - 1), y2])
+    return np.lib.stride_tricks.sliding_window_view(padded, mem)
+
+
+def candidate_grid(deltas: Sequence[float], Rs: Sequence[float]):
+    """every (delta, R) pair as two flat arrays, delta varying slowest"""
+    pairs = np.array(list(itertools.product(deltas, Rs)), dtype=float)
+    return pairs[:, 0], pairs[:, 1]
+
+
+class BatchKalmanResult:
+    """
+    filter output for G candidates over T ticks: filtered states x (G, T, n), their covariances P (G, T, n, n)
+    if kept, one step predictions z_hat (G, T), innovation variances s (G, T) and log likelihoods (G,)
+    """
+    def __init__(self, deltas, Rs, x, P, z_hat, s, log_likelihood, observed):
+        self.deltas = deltas
+        self.Rs = Rs
+        self.x = x
+        self.P = P
+        self.z_hat = z_hat
+        self.s = s
+        self.log_likelihood = log_likelihood
+        self.observed = observed
+
+    @property
+    def q(self):
+        return self.deltas / (1 - self.deltas)
+
+    def best(self):
+        """(delta, R) of the most likely candidate"""
+        i = int(np.nanargmax(self.log_likelihood))
+        return float(self.deltas[i]), float(self.Rs[i])
+
+
+# largest (G, T, n, n) covariance history batch_filter keeps, in bytes
+MAX_COVARIANCE_BYTES = 2 * 2**30
+
+
+def batch_filter(y1, y2, deltas, Rs, mem=None, keep_covariance=False, burn_in=100) -> BatchKalmanResult:
+    """
+    filter y1 on y2 for every (deltas[g], Rs[g]). ticks where y1 or H is missing only get the time update.
+    the log likelihood skips the first burn_in ticks, where the zero start makes the innovations huge.
+    keep_covariance keeps every step's covariance for rts_smooth, G * T * n^2 floats, refused past
+    MAX_COVARIANCE_BYTES: smooth fewer candidates, or a shorter mem
+    """
+    deltas = np.atleast_1d(np.asarray(deltas, dtype=float))
+    Rs = np.broadcast_to(np.asarray(Rs, dtype=float), deltas.shape).copy()
+    y1 = np.asarray(y1, dtype=float)
+    H = design(y2, mem)
+    T, n = H.shape
+    G = len(deltas)
+    if keep_covariance and G * T * n * n * 8 > MAX_COVARIANCE_BYTES:
+        raise ValueError(f"keeping the covariances of {G} candidates over {T} ticks with n={n} takes "
+                         f"{G * T * n * n * 8 / 2**30:.1f}GB, over MAX_COVARIANCE_BYTES")
+    q = (deltas / (1 - deltas))[:, None]
+    diagonal = np.arange(n)
+
+    x = np.zeros((G, n))
+    P = np.zeros((G, n, n))
+    xs = np.empty((G, T, n))
+    Ps = np.empty((G, T, n, n)) if keep_covariance else None
+    z_hat = np.full((G, T), np.nan)
+    s = np.full((G, T), np.nan)
+    observed = np.isfinite(y1) & np.isfinite(H).all(axis=1)
+    for t in range(T):
+        # time update, the state prediction is the previous state
+        P[:, diagonal, diagonal] += q
+        if observed[t]:
+            h = H[t]
+            Ph = P @ h
+            s_t = Ph @ h + Rs
+            K = Ph / s_t[:, None]
+            z_t = x @ h
+            x += K * (y1[t] - z_t)[:, None]
+            P -= K[:, :, None] * Ph[:, None, :]
+            z_hat[:, t] = z_t
+            s[:, t] = s_t
+        xs[:, t] = x
+        if keep_covariance:
+            Ps[:, t] = P
+
+    used = observed.copy()
+    used[:burn_in] = False
+    innovation = y1[used] - z_hat[:, used]
+    log_likelihood = -0.5 * np.sum(np.log(2 * np.pi * s[:, used]) + innovation ** 2 / s[:, used], axis=1)
+    return BatchKalmanResult(deltas, Rs, xs, Ps, z_hat, s, log_likelihood, observed)
+
+
+def rts_smooth(result: BatchKalmanResult):
+    """
+    Rauch-Tung-Striebel smoother over a batch_filter result kept with its covariances.
+    returns the smoothed states (G, T, n) and covariances (G, T, n, n)
+    """
+    if result.P is None:
+        raise ValueError("rts_smooth needs a batch_filter result with keep_covariance=True")
+    x_filtered, P_filtered = result.x, result.P
+    G, T, n = x_filtered.shape
+    diagonal = np.arange(n)
+    Q = result.q[:, None, None] * np.eye(n)
+
+    x_smooth = np.empty_like(x_filtered)
+    P_smooth = np.empty_like(P_filtered)
+    x_smooth[:, -1] = x_filtered[:, -1]
+    P_smooth[:, -1] = P_filtered[:, -1]
+    for t in range(T - 2, -1, -1):
+        P_t = P_filtered[:, t]
+        # the prediction of t+1 from t: same state, covariance + Q
+        P_predicted = P_t + Q
+        # gain C = P_t P_predicted^-1, through a solve as both are symmetric: C' = P_predicted^-1 P_t
+        C = np.swapaxes(np.linalg.solve(P_predicted, P_t), 1, 2)
+        x_smooth[:, t] = x_filtered[:, t] + (C @ (x_smooth[:, t + 1] - x_filtered[:, t])[:, :, None])[:, :, 0]
+        P_smooth[:, t] = P_t + C @ (P_smooth[:, t + 1] - P_predicted) @ np.swapaxes(C, 1, 2)
+    P_smooth[:, :, diagonal, diagonal] = np.maximum(P_smooth[:, :, diagonal, diagonal], 0)
+    return x_smooth, P_smooth
+
+
+def calibrate(days, deltas, Rs, mem=None, burn_in=100):
+    """
+    log likelihood of every (delta, R) in the grid of deltas x Rs summed over (round, day) pairs,
+    as a (len(deltas), len(Rs)) array
+    """
+    candidate_deltas, candidate_Rs = candidate_grid(deltas, Rs)
+    total = np.zeros(len(candidate_deltas))
+    for round_no, day in days:
+        y1, y2 = pair_mids(round_no, day)
+        total += batch_filter(y1, y2, candidate_deltas, candidate_Rs, mem=mem, keep_covariance=False,
+                              burn_in=burn_in).log_likelihood
+    return total.reshape(len(deltas), len(Rs))
+
+
+if __name__ == "__main__":
+    deltas = np.logspace(-8, -2, 25)
+    Rs = np.logspace(-3, 4, 25)
+    days = [(2, -1), (2, 0), (2, 1)]
+    if len(sys.argv) > 1:
+        days = [(int(sys.argv[1]), int(sys.argv[2]))]
+    log_likelihood = calibrate(days, deltas, Rs)
+    i, j = np.unravel_index(np.nanargmax(log_likelihood), log_likelihood.shape)
+    print(f"{log_likelihood.size} candidates, best delta {deltas[i]:.3g} R {Rs[j]:.3g} "
+          f"log likelihood {log_likelihood[i, j]:.1f}")
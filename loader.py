@@ -0,0 +1,95 @@
+"""
+Parallel loader for the Data/ price files as pandas frames, in place of parse_dat and the loading cell of FV_models.ipynb
+Every file is read on a worker of a thread or process pool with explicit compact dtypes:
+    day int8, timestamp int32, product category, prices int32, volumes int16, mid_price and profit_and_loss float64
+missing levels are 0, as in PriceBook. Each file is split by product in one pass, a stable sort on the product codes
+followed by a slice per product, and the result is {name: {product: frame}} keyed by the notebook's names,
+"round_2_day_0" for prices_round_2_day_0.csv. __MACOSX resource forks and other non price files are skipped
+"""
+
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from time import perf_counter
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+from backtester import DATA_DIR
+
+PRICE_FILE = re.compile(r"prices_(round_-?\d+_day_-?\d+)\.csv$")
+
+_PRICES = ["bid_price_1", "bid_price_2", "bid_price_3", "ask_price_1", "ask_price_2", "ask_price_3"]
+_VOLUMES = ["bid_volume_1", "bid_volume_2", "bid_volume_3", "ask_volume_1", "ask_volume_2", "ask_volume_3"]
+# levels parse as float32 so the blanks of missing levels can be read, then become 0 in the int columns
+_READ_DTYPES = {"day": np.int8, "timestamp": np.int32, "product": "category",
+                "mid_price": np.float64, "profit_and_loss": np.float64,
+                **{c: np.float32 for c in _PRICES + _VOLUMES}}
+
+
+def price_files(folder=DATA_DIR):
+    """{name: path} of the price files in folder, in name order, skipping __MACOSX and anything else"""
+    files = {}
+    for name in sorted(os.listdir(folder)):
+        match = PRICE_FILE.match(name)
+        if match and not name.startswith("._"):
+            files[match.group(1)] = os.path.join(folder, name)
+    return files
+
+
+def read_prices(path):
+    """one price file as a frame of the compact dtypes"""
+    frame = pd.read_csv(path, sep=";", dtype=_READ_DTYPES)
+    for column in _PRICES:
+        frame[column] = frame[column].fillna(0).astype(np.int32)
+    for column in _VOLUMES:
+        frame[column] = frame[column].fillna(0).astype(np.int16)
+    return frame
+
+
+def split_products(frame) -> Dict[str, pd.DataFrame]:
+    """
+    {product: frame} in order of first appearance, from one stable sort on the product codes:
+    every product is a contiguous slice of the sorted frame, with its rows in file order
+    """
+    codes = frame["product"].cat.codes.to_numpy()
+    order = np.argsort(codes, kind="stable")
+    ordered = frame.take(order)
+    bounds = np.searchsorted(codes[order], np.arange(len(frame["product"].cat.categories) + 1))
+    first = pd.unique(codes)
+    categories = frame["product"].cat.categories
+    return {categories[c]: ordered.iloc[bounds[c]:bounds[c + 1]] for c in first}
+
+
+def _load_file(path):
+    return split_products(read_prices(path))
+
+
+def load_prices(files: Iterable[str] = None, workers=None, processes=False) -> Dict[str, Dict[str, pd.DataFrame]]:
+    """
+    {name: {product: frame}} of price files, all of Data/ by default, read concurrently on workers threads,
+    or processes if processes is true. files are paths or a {name: path} from price_files
+    """
+    if files is None:
+        files = price_files()
+    elif not isinstance(files, dict):
+        files = {PRICE_FILE.search(path).group(1): path for path in files}
+    pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with pool(max_workers=workers) as executor:
+        frames = executor.map(_load_file, files.values())
+        return dict(zip(files, frames))
+
+
+def memory_usage(frames: Dict[str, Dict[str, pd.DataFrame]]):
+    """bytes held by the frames of load_prices"""
+    return sum(int(frame.memory_usage(deep=True).sum()) for products in frames.values() for frame in products.values())
+
+
+if __name__ == "__main__":
+    processes = "--processes" in sys.argv
+    start = perf_counter()
+    frames = load_prices(processes=processes)
+    print(f"{len(frames)} files, {sum(len(p) for p in frames.values())} product frames in {perf_counter() - start:.2f}s, "
+          f"{memory_usage(frames) / 1e6:.1f}MB")
@@ -0,0 +1,156 @@
+"""
+Order matching for local replays: crosses the orders returned by Trader.run against the
+visible book levels, then lets the rest sit against the market trades printed at the same timestamp
+"""
+
+import numpy as np
+import pandas as pd
+
+from datamodel import Trade
+
+# position limits per product, as in the Asset definitions of algo_final
+DEFAULT_LIMITS = {
+    "PEARLS": 20,
+    "BANANAS": 20,
+    "COCONUTS": 600,
+    "PINA_COLADAS": 300,
+    "BERRIES": 250,
+    "DIVING_GEAR": 50,
+    "DIP": 300,
+    "BAGUETTE": 150,
+    "UKULELE": 70,
+    "PICNIC_BASKET": 70,
+}
+
+SUBMISSION = "SUBMISSION"
+
+
+class TradeTape:
+    """
+    the market trades of one day as arrays per product: timestamp, price, quantity, and the
+    buyer and seller names (None in the _nn files)
+    """
+    def __init__(self, timestamps, prices, quantities, buyers, sellers):
+        self.timestamps = timestamps
+        self.prices = prices
+        self.quantities = quantities
+        self.buyers = buyers
+        self.sellers = sellers
+
+    @property
+    def products(self):
+        return list(self.timestamps.keys())
+
+    @classmethod
+    def from_frame(cls, df):
+        """build from a dataframe read from a trades file"""
+        timestamps, prices, quantities, buyers, sellers = {}, {}, {}, {}, {}
+        for product, frame in df.groupby("symbol", sort=False):
+            frame = frame.sort_values("timestamp", kind="stable")
+            timestamps[product] = frame["timestamp"].to_numpy(dtype=np.int64)
+            prices[product] = frame["price"].to_numpy(dtype=np.int32)
+            quantities[product] = frame["quantity"].to_numpy(dtype=np.int32)
+            buyers[product] = frame["buyer"].astype(object).where(frame["buyer"].notna(), None).to_numpy()
+            sellers[product] = frame["seller"].astype(object).where(frame["seller"].notna(), None).to_numpy()
+        return cls(timestamps, prices, quantities, buyers, sellers)
+
+    @classmethod
+    def from_csv(cls, path):
+        """read a semicolon separated trades file"""
+        return cls.from_frame(pd.read_csv(path, sep=";"))
+
+    def slices(self, product, timestamps):
+        """start and end index into the product arrays for each of the given timestamps"""
+        if product not in self.timestamps:
+            zeros = [0] * len(timestamps)
+            return zeros, zeros
+        product_timestamps = self.timestamps[product]
+        starts = np.searchsorted(product_timestamps, timestamps, side="left")
+        ends = np.searchsorted(product_timestamps, timestamps, side="right")
+        return starts.tolist(), ends.tolist()
+
+
+def _as_list(values):
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+
+def _take(quantity, prices, volumes, crosses):
+    """
+    take up to quantity from the volumes whose price crosses, in order, reducing volumes in place.
+    returns [(price, taken)] and the quantity left
+    """
+    taken = []
+    for i, volume in enumerate(volumes):
+        if not quantity:
+            break
+        if volume > 0 and crosses(prices[i]):
+            amount = min(quantity, volume)
+            volumes[i] = volume - amount
+            quantity -= amount
+            taken.append((prices[i], amount))
+    return taken, quantity
+
+
+def within_limit(orders, position, limit):
+    """
+    the exchange cancels every order of a product if all buys (or all sells) filling
+    would take the position past the limit
+    """
+    buys = sum(int(o.quantity) for o in orders if o.quantity > 0)
+    sells = sum(-int(o.quantity) for o in orders if o.quantity < 0)
+    return position + buys <= limit and position - sells >= -limit
+
+
+def match_orders(orders, levels, trade_prices, trade_quantities, position, limit):
+    """
+    match one product's orders for one tick.
+    levels is the (12,) book row, trade_* the prints at this timestamp.
+    returns a list of (price, signed quantity) fills and a list of the print quantities left over.
+    the book has three levels a side and a tick a handful of prints, so this walks them in plain python:
+    numpy calls on arrays this small cost more than the work
+    """
+    trade_quantities = [int(q) for q in _as_list(trade_quantities)]
+    if not within_limit(orders, position, limit):
+        return [], trade_quantities
+    levels = [int(x) for x in _as_list(levels)]
+    bid_prices, bid_volumes = levels[0:6:2], levels[1:6:2]
+    ask_prices, ask_volumes = levels[6:12:2], levels[7:12:2]
+
+    # best priced orders first on each side, ties in submission order
+    buys = sorted((o for o in orders if o.quantity > 0), key=lambda o: -o.price)
+    sells = sorted((o for o in orders if o.quantity < 0), key=lambda o: o.price)
+    fills = []
+    resting = []
+    for order in buys:
+        price, quantity = int(order.price), int(order.quantity)
+        taken, left = _take(quantity, ask_prices, ask_volumes, lambda p: p <= price)
+        fills.extend(taken)
+        if left:
+            resting.append((price, left))
+    for order in sells:
+        price, quantity = int(order.price), -int(order.quantity)
+        taken, left = _take(quantity, bid_prices, bid_volumes, lambda p: p >= price)
+        fills.extend((p, -q) for p, q in taken)
+        if left:
+            resting.append((price, -left))
+
+    # resting quotes fill at their own price against prints at that price or through it
+    if trade_quantities:
+        trade_prices = [int(p) for p in _as_list(trade_prices)]
+        for price, quantity in resting:
+            if quantity > 0:
+                taken, left = _take(quantity, trade_prices, trade_quantities, lambda p: p <= price)
+                filled = quantity - left
+            else:
+                taken, left = _take(-quantity, trade_prices, trade_quantities, lambda p: p >= price)
+                filled = -(-quantity - left)
+            if filled:
+                fills.append((price, filled))
+    return fills, trade_quantities
+
+
+def fills_to_trades(product, fills, timestamp):
+    """own trades as the exchange reports them"""
+    return [Trade(product, price, abs(quantity),
+                  SUBMISSION if quantity > 0 else "", "" if quantity > 0 else SUBMISSION, timestamp)
+            for price, quantity in fills]
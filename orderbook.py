@@ -0,0 +1,184 @@
+"""
+OrderDepth whose sides stay sorted, with the best price, spread, mid and cumulative depth cached
+The sides are still dicts of price -> volume, so every algo can use it in place of datamodel.OrderDepth
+"""
+
+from collections.abc import ItemsView, KeysView, ValuesView
+
+from datamodel import OrderDepth
+
+
+class _SortedKeys(KeysView):
+    """set-like keys view of a BookSide, iterating best price first"""
+    __slots__ = ()
+
+    def __iter__(self):
+        return iter(self._mapping.prices)
+
+
+class _SortedItems(ItemsView):
+    __slots__ = ()
+
+    def __iter__(self):
+        prices = self._mapping.prices
+        return zip(prices, map(self._mapping.__getitem__, prices))
+
+
+class _SortedValues(ValuesView):
+    __slots__ = ()
+
+    def __iter__(self):
+        return map(self._mapping.__getitem__, self._mapping.prices)
+
+
+class BookSide(dict):
+    """
+    price -> volume dict that iterates best price first and caches its sorted prices and cumulative depth.
+    keys, items and values are views in the same order. no __init__, so building one from levels is a plain
+    dict construction
+    """
+    descending = False
+    _prices = None
+    _cumulative = None
+
+    def _invalidate(self):
+        self._prices = None
+        self._cumulative = None
+
+    def __setitem__(self, price, volume):
+        super().__setitem__(price, volume)
+        self._invalidate()
+
+    def __delitem__(self, price):
+        super().__delitem__(price)
+        self._invalidate()
+
+    def pop(self, *args):
+        self._invalidate()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._invalidate()
+        return super().popitem()
+
+    def clear(self):
+        self._invalidate()
+        super().clear()
+
+    def update(self, *args, **kwargs):
+        self._invalidate()
+        super().update(*args, **kwargs)
+
+    def setdefault(self, price, volume=None):
+        self._invalidate()
+        return super().setdefault(price, volume)
+
+    def __ior__(self, other):
+        self._invalidate()
+        return super().__ior__(other)
+
+    def __iter__(self):
+        return iter(self.prices)
+
+    def keys(self):
+        return _SortedKeys(self)
+
+    def items(self):
+        return _SortedItems(self)
+
+    def values(self):
+        return _SortedValues(self)
+
+    @property
+    def prices(self):
+        """prices best first, the cached list itself, not to be changed"""
+        if self._prices is None:
+            self._prices = sorted(dict.keys(self), reverse=self.descending)
+        return self._prices
+
+    @property
+    def best(self):
+        """best price, None if the side is empty"""
+        prices = self.prices
+        return prices[0] if prices else None
+
+    @property
+    def best_volume(self):
+        prices = self.prices
+        return self[prices[0]] if prices else 0
+
+    @property
+    def cumulative(self):
+        """absolute volume available at each price or better, best first"""
+        if self._cumulative is None:
+            total = 0
+            cumulative = []
+            for price in self.prices:
+                total += abs(self[price])
+                cumulative.append(total)
+            self._cumulative = cumulative
+        return self._cumulative
+
+
+class BidSide(BookSide):
+    """buy orders, highest price first"""
+    descending = True
+
+
+class AskSide(BookSide):
+    """sell orders, lowest price first"""
+    descending = False
+
+
+class SortedOrderDepth(OrderDepth):
+    """OrderDepth with sorted sides and cached best prices, spread and mid"""
+    __slots__ = ()
+
+    def __init__(self, buy_orders=(), sell_orders=()):
+        self.buy_orders = BidSide(buy_orders)
+        self.sell_orders = AskSide(sell_orders)
+
+    @classmethod
+    def from_levels(cls, row):
+        """
+        build from a (12,) price file row, bid price/volume x3 then ask price/volume x3,
+        whose levels are already best first; zero volume marks a missing level
+        """
+        order_depth = cls()
+        buy_orders = order_depth.buy_orders
+        sell_orders = order_depth.sell_orders
+        bids = []
+        asks = []
+        for i in range(0, 6, 2):
+            if row[i + 1]:
+                dict.__setitem__(buy_orders, row[i], row[i + 1])
+                bids.append(row[i])
+        for i in range(6, 12, 2):
+            if row[i + 1]:
+                # sell volumes are negative, as on the exchange
+                dict.__setitem__(sell_orders, row[i], -row[i + 1])
+                asks.append(row[i])
+        buy_orders._prices = bids
+        sell_orders._prices = asks
+        return order_depth
+
+    @property
+    def best_bid(self):
+        return self.buy_orders.best
+
+    @property
+    def best_ask(self):
+        return self.sell_orders.best
+
+    @property
+    def spread(self):
+        """best ask - best bid, None if either side is empty"""
+        if self.buy_orders.prices and self.sell_orders.prices:
+            return self.sell_orders.prices[0] - self.buy_orders.prices[0]
+        return None
+
+    @property
+    def mid(self):
+        if self.buy_orders.prices and self.sell_orders.prices:
+            return (self.sell_orders.prices[0] + self.buy_orders.prices[0]) / 2
+        return None
@@ -0,0 +1,226 @@
+"""
+Recorded sessions of TradingStates stored as tick to tick deltas
+A recording is a run of blocks, each a keyframe holding the whole state in the compact json layout of codec
+followed by up to keyframe_interval - 1 deltas against the state before, one json line each:
+    [timestamp, books, own_trades, market_trades, symbols, position, observations, listings]
+    books         per order depth symbol: [bid price steps, bid volumes, ask price steps, ask volumes], best first.
+                  the first step is from the previous tick's best price on that side, the rest from the level before
+    *_trades      {symbol: flattened trades} of the symbols that traded only
+    symbols       [order depth, own trades, market trades symbols] if any changed, else null
+    position, observations  [{product: value} that changed, [products that went away]]
+    listings      compact listings if they changed, else null
+The bots requote every tick, so a list of changed levels is nearly the whole book; coded against the previous
+best prices a book is mostly small repeating numbers instead, which the zlib compression of each block squeezes.
+A block is a header (first timestamp, number of states, compressed length) and its compressed lines,
+so a reader indexes the keyframes from the headers alone and seeks by decompressing a single block
+"""
+
+import json
+import zlib
+import struct
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator
+
+from datamodel import Listing, TradingState
+import codec
+from orderbook import SortedOrderDepth
+
+# first timestamp, number of states, compressed length
+_BLOCK = struct.Struct("<qII")
+
+
+def _steps(prices, reference):
+    steps = []
+    for price in prices:
+        steps.append(price - reference)
+        reference = price
+    return steps
+
+
+def _prices(steps, reference):
+    prices = []
+    for step in steps:
+        reference += step
+        prices.append(reference)
+    return prices
+
+
+def _changes(previous: Dict, current: Dict):
+    # removals are listed apart, so a value of None is kept as one
+    changes = {k: v for k, v in current.items() if k not in previous or previous[k] != v}
+    return [changes, [k for k in previous if k not in current]]
+
+
+def _apply(previous: Dict, delta):
+    changes, removed = delta
+    values = dict(previous)
+    for k in removed:
+        del values[k]
+    values.update(changes)
+    return values
+
+
+def _listing_tuples(listings):
+    return [(l.symbol, l.product, l.denomination) for l in listings.values()]
+
+
+class _Previous:
+    """what the next delta is taken against, copied since the trader is free to mutate the state"""
+    def __init__(self, state, best):
+        # compared against a snapshot, as a stream may add to one listings dict in place
+        self.listings = _listing_tuples(state.listings)
+        self.listings_dict = state.listings
+        self.symbols = [list(state.order_depths), list(state.own_trades), list(state.market_trades)]
+        self.position = dict(state.position)
+        self.observations = dict(state.observations)
+        # symbol -> (best bid, best ask), carried over while a side is empty
+        self.best = {}
+        for symbol, order_depth in state.order_depths.items():
+            bid, ask = best.get(symbol, (0, 0))
+            if order_depth.buy_orders:
+                bid = max(dict.keys(order_depth.buy_orders))
+            if order_depth.sell_orders:
+                ask = min(dict.keys(order_depth.sell_orders))
+            self.best[symbol] = (bid, ask)
+
+
+class DeltaEncoder:
+    """turns consecutive TradingStates into json lines, a keyframe every keyframe_interval states"""
+    def __init__(self, keyframe_interval=100):
+        self.keyframe_interval = keyframe_interval
+        self.count = 0
+        self.previous = None
+
+    @property
+    def next_is_keyframe(self):
+        return self.previous is None or self.count % self.keyframe_interval == 0
+
+    def encode(self, state: TradingState) -> bytes:
+        previous = self.previous
+        if self.next_is_keyframe:
+            line = codec.encode_json(state)
+            best = {}
+        else:
+            best = previous.best
+            symbols = [list(state.order_depths), list(state.own_trades), list(state.market_trades)]
+            books = []
+            for symbol, order_depth in state.order_depths.items():
+                bid, ask = best.get(symbol, (0, 0))
+                bids = sorted(dict.keys(order_depth.buy_orders), reverse=True)
+                asks = sorted(dict.keys(order_depth.sell_orders))
+                books.append([_steps(bids, bid), [dict.__getitem__(order_depth.buy_orders, p) for p in bids],
+                              _steps(asks, ask), [dict.__getitem__(order_depth.sell_orders, p) for p in asks]])
+            listings = None
+            if _listing_tuples(state.listings) != previous.listings:
+                listings = codec.to_compact(state)[1]
+            line = codec._ENCODER.encode([
+                state.timestamp, books,
+                {s: flat for s, flat in codec._flat_trades(state.own_trades).items() if flat},
+                {s: flat for s, flat in codec._flat_trades(state.market_trades).items() if flat},
+                symbols if symbols != previous.symbols else None,
+                _changes(previous.position, state.position),
+                _changes(previous.observations, state.observations),
+                listings])
+        self.previous = _Previous(state, best)
+        self.count += 1
+        return line.encode()
+
+
+class DeltaDecoder:
+    """turns the lines of a DeltaEncoder back into TradingStates, starting from a keyframe"""
+    def __init__(self):
+        self.previous = None
+
+    def decode(self, line, keyframe) -> TradingState:
+        data = json.loads(line)
+        previous = self.previous
+        if keyframe:
+            state = codec.from_compact(data)
+            best = {}
+        elif previous is None:
+            raise ValueError("delta line without a keyframe before it")
+        else:
+            timestamp, books, own_trades, market_trades, symbols, position, observations, listings = data
+            best = previous.best
+            if symbols is None:
+                symbols = previous.symbols
+            order_depths = {}
+            for symbol, (bid_steps, bid_volumes, ask_steps, ask_volumes) in zip(symbols[0], books):
+                bid, ask = best.get(symbol, (0, 0))
+                order_depths[symbol] = SortedOrderDepth(zip(_prices(bid_steps, bid), bid_volumes),
+                                                        zip(_prices(ask_steps, ask), ask_volumes))
+            state = TradingState(
+                timestamp,
+                {l[0]: Listing(*l) for l in listings} if listings is not None else previous.listings_dict,
+                order_depths,
+                {s: codec._trades(s, own_trades.get(s, [])) for s in symbols[1]},
+                {s: codec._trades(s, market_trades.get(s, [])) for s in symbols[2]},
+                _apply(previous.position, position),
+                _apply(previous.observations, observations))
+        self.previous = _Previous(state, best)
+        return state
+
+
+def write_session(path, states: Iterable[TradingState], keyframe_interval=100, level=6):
+    """record states to path, one compressed block per keyframe. returns the number of states written"""
+    encoder = DeltaEncoder(keyframe_interval)
+    lines = []
+    first = None
+    with open(path, "wb") as f:
+        for state in states:
+            if encoder.next_is_keyframe:
+                if lines:
+                    _write_block(f, first, lines, level)
+                lines = []
+                first = state.timestamp
+            lines.append(encoder.encode(state))
+        if lines:
+            _write_block(f, first, lines, level)
+    return encoder.count
+
+
+def _write_block(f, first, lines, level):
+    block = zlib.compress(b"\n".join(lines), level)
+    f.write(_BLOCK.pack(first, len(lines), len(block)))
+    f.write(block)
+
+
+class Session:
+    """
+    a recorded session: iterate it for every state, or seek(timestamp) for the states from a timestamp on.
+    timestamps must increase through the recording for seek to be meaningful
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        # (first timestamp, offset) of every block, from the block headers alone
+        self.blocks = []
+        self.count = 0
+        offset = 0
+        while offset < len(self.data):
+            first, count, length = _BLOCK.unpack_from(self.data, offset)
+            self.blocks.append((first, offset))
+            self.count += count
+            offset += _BLOCK.size + length
+        self.block_timestamps = [t for t, _ in self.blocks]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self) -> Iterator[TradingState]:
+        return self.seek(None)
+
+    def seek(self, timestamp=None) -> Iterator[TradingState]:
+        """states from the first one at or after timestamp on, decoded from the keyframe before it"""
+        start = 0
+        if timestamp is not None:
+            start = max(bisect_right(self.block_timestamps, timestamp) - 1, 0)
+        decoder = DeltaDecoder()
+        for _, offset in self.blocks[start:]:
+            _, count, length = _BLOCK.unpack_from(self.data, offset)
+            offset += _BLOCK.size
+            lines = zlib.decompress(self.data[offset:offset + length]).split(b"\n")
+            for i, line in enumerate(lines):
+                state = decoder.decode(line, keyframe=i == 0)
+                if timestamp is None or state.timestamp >= timestamp:
+                    yield state
@@ -0,0 +1,163 @@
+"""
+Lazy TradingState stream over any number of price and trade files
+Rows are read one at a time and merged on (session, day, timestamp), so memory is O(products) not O(ticks).
+a session is the (round, day) of a file name, so days of different rounds stay apart
+"""
+
+import os
+import re
+import csv
+import heapq
+import contextlib
+from itertools import groupby
+from typing import Dict, Iterable, Iterator
+
+from datamodel import Listing, TradingState, Trade
+from orderbook import SortedOrderDepth
+from backtester import LEVEL_COLUMNS, OBSERVATION_PRODUCTS, order_depth_from_levels
+from matching import DEFAULT_LIMITS, match_orders, fills_to_trades
+
+PRICES, TRADES = 0, 1
+
+
+def _day_of(path):
+    """day number from a file name like trades_round_2_day_-1_nn.csv"""
+    return int(re.search(r"day_(-?\d+)", os.path.basename(path)).group(1))
+
+
+def _session_of(path):
+    """(round, day) from a file name like prices_round_2_day_-1.csv, round None if the name has none"""
+    match = re.search(r"round_(-?\d+)", os.path.basename(path))
+    return int(match.group(1)) if match else None, _day_of(path)
+
+
+def _price_rows(path, session):
+    """(session, day, timestamp, PRICES, product, levels, mid) per row of a price file"""
+    with open(path, newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+        header = next(reader)
+        level_index = [header.index(c) for c in LEVEL_COLUMNS]
+        day_i, timestamp_i, product_i, mid_i = (header.index(c) for c in ("day", "timestamp", "product", "mid_price"))
+        for row in reader:
+            levels = [int(float(row[i])) if row[i] else 0 for i in level_index]
+            mid = float(row[mid_i]) if row[mid_i] else None
+            yield session, int(row[day_i]), int(row[timestamp_i]), PRICES, row[product_i], levels, mid
+
+
+def _trade_rows(path, session):
+    """(session, day, timestamp, TRADES, symbol, Trade, None) per row of a trades file"""
+    day = _day_of(path)
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f, delimiter=";")
+        for row in reader:
+            timestamp = int(row["timestamp"])
+            trade = Trade(row["symbol"], int(float(row["price"])), int(row["quantity"]),
+                          row["buyer"] or None, row["seller"] or None, timestamp)
+            yield session, day, timestamp, TRADES, row["symbol"], trade, None
+
+
+def stream_states(price_paths: Iterable[str], trade_paths: Iterable[str] = ()) -> Iterator[TradingState]:
+    """
+    yield one TradingState per (day, timestamp) of the price files, in order.
+    market_trades hold the prints since the previous state, as on the exchange.
+    sessions, the (round, day) of the file names, play one after another in the order of their price files,
+    a trades file joining the session of its name; every file must itself be in timestamp order
+    """
+    price_paths, trade_paths = list(price_paths), list(trade_paths)
+    sessions = {}
+    for path in price_paths + trade_paths:
+        sessions.setdefault(_session_of(path), len(sessions))
+    sources = [_price_rows(p, sessions[_session_of(p)]) for p in price_paths] + \
+              [_trade_rows(p, sessions[_session_of(p)]) for p in trade_paths]
+    # prices sort before trades at the same timestamp, so prints land in the following state
+    rows = heapq.merge(*sources, key=lambda r: r[:4])
+    listings: Dict[str, Listing] = {}
+    pending: Dict[str, list] = {}
+    current_session = None
+    for (session, day, timestamp, kind), group in groupby(rows, key=lambda r: r[:4]):
+        if (session, day) != current_session:
+            # trades after the last tick of a session do not carry into the next
+            current_session = (session, day)
+            pending = {}
+        if kind == TRADES:
+            for row in group:
+                pending.setdefault(row[4], []).append(row[5])
+            continue
+        order_depths = {}
+        observations = {}
+        for _, _, _, _, product, levels, mid in group:
+            if product not in listings:
+                listings[product] = Listing(product, product, "SEASHELLS")
+            if product in OBSERVATION_PRODUCTS:
+                order_depths[product] = SortedOrderDepth()
+                observations[product] = mid
+            else:
+                order_depths[product] = order_depth_from_levels(levels)
+        market_trades = {p: pending.get(p, []) for p in order_depths}
+        pending = {}
+        yield TradingState(timestamp, listings, order_depths, {p: [] for p in order_depths},
+                           market_trades, {}, observations)
+
+
+def _levels(order_depth):
+    """(12,) book row of an OrderDepth, the inverse of order_depth_from_levels"""
+    row = [0] * 12
+    for i, price in enumerate(sorted(order_depth.buy_orders, reverse=True)[:3]):
+        row[2 * i], row[2 * i + 1] = price, order_depth.buy_orders[price]
+    for i, price in enumerate(sorted(order_depth.sell_orders)[:3]):
+        row[6 + 2 * i], row[7 + 2 * i] = price, -order_depth.sell_orders[price]
+    return row
+
+
+def replay_stream(trader, states: Iterable[TradingState], limits=None, log=None):
+    """
+    run trader over a state stream with the same matching as the Backtester, keeping only
+    running totals. orders from one state are matched once the next state brings the prints
+    they could rest against. a state whose timestamp does not move on starts a new session:
+    the orders left from the last one are dropped and the position is closed at its last mids.
+    returns final position and pnl per product
+    """
+    if limits is None:
+        limits = dict(DEFAULT_LIMITS)
+        for product, asset in getattr(trader, "asset_dicts", {}).items():
+            limits[product] = asset.limit
+    position: Dict[str, int] = {}
+    cash: Dict[str, float] = {}
+    mids: Dict[str, float] = {}
+    last = None
+    sink = log if log is not None else open(os.devnull, "w")
+    with contextlib.redirect_stdout(sink):
+        for state in states:
+            if last is not None and state.timestamp <= last[0].timestamp:
+                for product, quantity in position.items():
+                    cash[product] = cash.get(product, 0) + quantity * mids.get(product, 0)
+                position = {p: 0 for p in position}
+                mids = {}
+                last = None
+            if last is not None:
+                last_state, result = last
+                for product, orders in result.items():
+                    orders = [o for o in orders if int(o.quantity) != 0]
+                    if not orders or product not in last_state.order_depths:
+                        continue
+                    prints = state.market_trades.get(product, [])
+                    fills, remaining = match_orders(orders, _levels(last_state.order_depths[product]),
+                                                    [t.price for t in prints], [t.quantity for t in prints],
+                                                    position.get(product, 0), limits.get(product, 0))
+                    state.own_trades[product] = fills_to_trades(product, fills, last_state.timestamp)
+                    for price, quantity in fills:
+                        position[product] = position.get(product, 0) + quantity
+                        cash[product] = cash.get(product, 0) - price * quantity
+                    for trade, left in zip(prints, remaining):
+                        trade.quantity = left
+                    state.market_trades[product] = [t for t in prints if t.quantity > 0]
+            state.position = dict(position)
+            for product, order_depth in state.order_depths.items():
+                if order_depth.buy_orders and order_depth.sell_orders:
+                    mids[product] = (max(order_depth.buy_orders) + min(order_depth.sell_orders)) / 2
+            print(state.timestamp, end=" ")
+            last = (state, trader.run(state))
+    if log is None:
+        sink.close()
+    pnl = {p: cash.get(p, 0) + position.get(p, 0) * mids.get(p, 0) for p in set(cash) | set(position)}
+    return position, pnl
@@ -0,0 +1,105 @@
+"""
+Parameter sweeps of a Trader over recorded days, fanned out over a process pool
+Workers memory-map the data_cache arrays, so the market data is loaded once and shared through the page cache
+"""
+
+import os
+import csv
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from backtester import Backtester, load_trader, price_file, trades_file
+from data_cache import load_book, load_tape
+
+# market data of the worker process, set once by _init_worker
+_DAYS = {}
+
+
+def grid(**axes) -> List[Dict]:
+    """every combination of the given values, e.g. grid(zscore_high=[1.5, 2], hedge_ratio=[1.8, 1.875])"""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[n] for n in names))]
+
+
+def configure(trader, params):
+    """
+    set parameters on a trader: plain names are trader attributes (zscore_high),
+    PRODUCT.attribute names are set on that product's Asset (COCONUTS.period), SPREAD.attribute names
+    on that Spread of a trader with a SpreadBook (PAIRS.sell_above) and strategy.attribute names
+    on that registered strategy (berries.start). a trader without assets, spreads or strategies has none to set
+    """
+    for name, value in params.items():
+        if "." in name:
+            owner, attribute = name.split(".", 1)
+            assets = getattr(trader, "asset_dicts", {})
+            spreads = getattr(trader, "spreads", None)
+            strategies = getattr(trader, "strategies", None)
+            if owner in assets:
+                target = assets[owner]
+            elif spreads is not None and owner in spreads.by_name:
+                target = spreads[owner]
+            elif strategies is not None and owner in strategies.by_name:
+                target = strategies[owner]
+            else:
+                raise AttributeError(f"{type(trader).__name__} has no parameter owner {owner} "
+                                     f"(not an asset, spread or strategy)")
+            setattr(target, attribute, value)
+        elif hasattr(trader, name):
+            setattr(trader, name, value)
+        else:
+            raise AttributeError(f"{type(trader).__name__} has no parameter {name}")
+    return trader
+
+
+def _init_worker(days):
+    for round_no, day in days:
+        _DAYS[round_no, day] = (load_book(price_file(round_no, day)), load_tape(trades_file(round_no, day)))
+
+
+def _run_point(module, params, day_key):
+    book, tape = _DAYS[day_key]
+    trader = configure(load_trader(module), params)
+    # without the time budget, so a point's pnl does not depend on the load of the pool
+    return Backtester(trader, book, tape, deterministic=True).run().final_pnl()
+
+
+def sweep(module, points: List[Dict], days: List[Tuple[int, int]], workers=None, out=None):
+    """
+    replay module's Trader for every parameter point on every (round, day).
+    returns {parameter tuple: {product: pnl summed over days}}, and writes it as a
+    semicolon separated table to out if given
+    """
+    # convert any stale csv once here rather than in every worker
+    _init_worker(days)
+    _DAYS.clear()
+    names = sorted({n for p in points for n in p})
+    keys = [tuple(p.get(n) for n in names) for p in points]
+    results: Dict[tuple, Dict[str, float]] = {k: {} for k in keys}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=_init_worker, initargs=(days,)) as pool:
+        futures = {pool.submit(_run_point, module, point, day_key): key
+                   for key, point in zip(keys, points) for day_key in days}
+        for future, key in futures.items():
+            for product, pnl in future.result().items():
+                results[key][product] = results[key].get(product, 0) + pnl
+    if out is not None:
+        write_results(out, names, results)
+    return results
+
+
+def write_results(path, names, results):
+    """one row per parameter tuple: the parameters, pnl per product and the total"""
+    products = sorted({p for pnl in results.values() for p in pnl})
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(names + products + ["total"])
+        for key, pnl in sorted(results.items(), key=lambda kv: -sum(kv[1].values())):
+            writer.writerow(list(key) + [pnl.get(p, 0) for p in products] + [sum(pnl.values())])
+
+
+if __name__ == "__main__":
+    points = grid(zscore_high=[2.0, 2.5], zscore_low=[-0.5, 0.0])
+    results = sweep("algo_hedging_kalman_2", points, [(2, -1), (2, 0), (2, 1)])
+    for key, pnl in results.items():
+        print(key, round(sum(pnl.values()), 1))
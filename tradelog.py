@@ -0,0 +1,64 @@
+"""
+Decoder for the compact logs of algo_final.Logger
+A log is a header line, then one line per run that logged anything:
+    ~H {"products": [product, ...], "events": {code: [name, [field, ...]], ...}}
+    ~timestamp product,event,field,...,product,event,field,...
+records are read off a line by the field count of their event code, product -1 being one the logger did not know.
+anything before the ~ on a line, like the timestamp prefix of the exchange logs, is ignored, as are lines without one
+"""
+
+import sys
+import json
+from typing import Iterable, Iterator, NamedTuple
+
+
+class Event(NamedTuple):
+    timestamp: int
+    product: str
+    name: str
+    fields: dict
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def decode(lines: Iterable[str]) -> Iterator[Event]:
+    """the events of a log, in the order they were recorded"""
+    products = events = None
+    for line in lines:
+        start = line.find("~")
+        if start < 0:
+            continue
+        tag, _, body = line[start + 1:].strip().partition(" ")
+        if tag == "H":
+            header = json.loads(body)
+            products = header["products"]
+            events = {int(code): (name, fields) for code, (name, fields) in header["events"].items()}
+            continue
+        if events is None:
+            raise ValueError("log record before its ~H header line")
+        timestamp = int(tag)
+        values = body.split(",") if body else []
+        i = 0
+        while i < len(values):
+            product = int(values[i])
+            name, fields = events[int(values[i + 1])]
+            end = i + 2 + len(fields)
+            if end > len(values):
+                raise ValueError(f"truncated {name} record at timestamp {timestamp}")
+            yield Event(timestamp, products[product] if product >= 0 else None, name,
+                        dict(zip(fields, map(_number, values[i + 2:end]))))
+            i = end
+
+
+def format_event(event: Event) -> str:
+    fields = " ".join(f"{k}={v}" for k, v in event.fields.items())
+    return f"{event.timestamp} {event.name} {event.product} {fields}"
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1]) if len(sys.argv) > 1 else sys.stdin as f:
+        for event in decode(f):
+            print(format_event(event))